@@ -0,0 +1,140 @@
+import json
+import os
+import platform
+import time
+import numpy as np
+from config import CONFIG, DAYS_PER_UPDATE
+import sweep
+from enums import State
+
+# Bump when a benchmark's workload changes, so old baselines are not compared against it
+BENCH_VERSION = 2
+SIZES = (500, 2000, 10000, 100000, 1000000)
+DAY_MAX = 10000         # a simulated day is 1800 updates; larger sizes skip it
+LAYOUT_MAX = 20000      # one force-layout step is seconds past this
+RENDER_MAX = 20000
+
+def timed(fn, repeat):
+    # Wall-clock milliseconds for each of `repeat` calls
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+def stats(samples):
+    s = np.asarray(samples)
+    return {'median_ms': float(np.median(s)), 'min_ms': float(s.min()), 'max_ms': float(s.max()), 'runs': len(s)}
+
+def warm_engine(n, seed, updates=200):
+    # An engine a few hundred updates into an outbreak big enough to load
+    # the transmission and bio paths. Latent periods run to days, so the
+    # seeds' onset is brought forward to now (their generation moves on so
+    # the original onset events go stale) and they start shedding right away
+    from engine import Engine
+    from transitions import ONSET
+    CONFIG.pop_size = n
+    CONFIG.init_infected = max(10, n // 100)
+    engine = Engine(headless=True, seed=seed)
+    pop = engine.pop
+    seeds = np.flatnonzero(pop.state == State.LATENT.value)
+    pop.gen[seeds] += 1
+    engine.transitions.push(np.full(len(seeds), engine.sim_time), seeds, ONSET, pop.gen[seeds])
+    for _ in range(updates): engine.update()
+    shedding = int((pop.shedding() > 0).sum())
+    if shedding == 0 or len(engine.transitions) == 0:
+        raise RuntimeError(f"warm-up left {shedding} agents shedding and {len(engine.transitions)} pending transitions")
+    return engine
+
+def bench_size(n, repeat=5, seed=0, day_max=DAY_MAX, layout_max=LAYOUT_MAX, render_max=RENDER_MAX, out=None):
+    from engine import Engine
+    saved = dict(vars(CONFIG))
+    results = {}
+    def record(name, samples):
+        results[name] = stats(samples)
+        if out: out.write(f"  {n:>8d} {name:14s} {results[name]['median_ms']:10.3f} ms\n")
+    try:
+        CONFIG.pop_size = n
+        CONFIG.init_infected = max(10, n // 100)
+        record('init_world', timed(lambda: Engine(headless=True, seed=seed), min(repeat, 3)))
+
+        engine = warm_engine(n, seed)
+        dt = DAYS_PER_UPDATE * CONFIG.sim_speed
+        record('update', timed(engine.update, repeat * 4))
+        record('schedule', timed(engine.apply_schedule, repeat))
+        record('movement', timed(lambda: engine.move_spatial(dt), repeat * 4))
+        record('transmission', timed(lambda: engine.process_graph_transmission(dt), repeat * 4))
+        def bio():
+            # Transitions are event-driven, so the clock jumps to the next one
+            # due and every call has events to process
+            engine.sim_time = max(engine.sim_time + dt, engine.transitions.next_time())
+            engine.pop.now = engine.sim_time
+            engine.update_bio(dt)
+        record('bio', timed(bio, repeat * 4))
+
+        if n <= day_max:
+            def day():
+                start = engine.day
+                while engine.day == start: engine.update()
+            day()
+            record('day', timed(day, 1 if n > 2000 else 2))
+
+        if n <= layout_max:
+            from layout import ForceLayout
+            layout = ForceLayout(engine.pop, engine.hub_graph_pos, engine.contacts, rng=np.random.default_rng(seed))
+            record('layout', timed(layout.step, repeat))
+
+        if n <= render_max:
+            render = render_surface()
+            if render: record('render', timed(lambda: render(engine), repeat))
+    finally:
+        CONFIG.__dict__.update(saved)
+    return results
+
+def render_surface():
+    # Offscreen SIM-view renderer, or None without pygame
+    try:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        import pygame
+        from renderer import Renderer
+        from profiling import Profiler
+    except ImportError:
+        return None
+    from config import WIDTH, HEIGHT
+    pygame.init()
+    screen = pygame.Surface((WIDTH, HEIGHT))
+    renderer, prof = Renderer(), Profiler(False)
+    return lambda engine: renderer.draw(screen, engine, prof)
+
+def run(sizes=SIZES, repeat=5, seed=0, out=None, **limits):
+    doc = {'version': BENCH_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+           'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                       'platform': platform.platform(), 'processor': platform.processor(), 'cpus': os.cpu_count()},
+           'code': sweep.code_version(),
+           'results': {}}
+    for n in sizes:
+        for name, s in bench_size(n, repeat, seed, out=out, **limits).items():
+            doc['results'].setdefault(name, {})[str(n)] = s
+    return doc
+
+def save(doc, path):
+    with open(path, 'w') as f: json.dump(doc, f, indent=2)
+
+def load(path):
+    with open(path) as f: return json.load(f)
+
+def compare(current, baseline, tolerance=0.25):
+    # One row per (benchmark, size) present in both; a row regresses when its
+    # median is more than `tolerance` slower than the baseline's
+    if baseline.get('version') != current.get('version'):
+        raise ValueError(f"baseline is bench version {baseline.get('version')}, this is {current.get('version')}")
+    rows = []
+    for name, by_size in current['results'].items():
+        for size, s in by_size.items():
+            ref = baseline['results'].get(name, {}).get(size)
+            if ref is None: continue
+            ratio = s['median_ms'] / max(ref['median_ms'], 1e-9)
+            rows.append({'name': name, 'size': int(size), 'baseline_ms': ref['median_ms'], 'current_ms': s['median_ms'],
+                         'ratio': ratio, 'regressed': ratio > 1.0 + tolerance})
+    return rows
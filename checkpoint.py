@@ -0,0 +1,141 @@
+import json
+import os
+import numpy as np
+from config import CONFIG
+from enums import State
+from population import Population
+from contacts import ContactGraph
+from transitions import TransitionScheduler
+from history import History
+from transmission import TransmissionTree, COLUMNS as TREE_COLUMNS
+
+# File layout: MAGIC, uint64 header length, JSON header, then each array's raw
+# bytes at a 64-byte aligned offset so it can be memory-mapped in place
+MAGIC = b'EPICKPT1'
+ALIGN = 64
+DERIVED = ('hub_pos', 'hub_radius')    # rebuilt from the hubs on load
+
+def align(x):
+    return (x + ALIGN - 1) // ALIGN * ALIGN
+
+def engine_arrays(engine):
+    pop = engine.pop
+    arrays = {f"pop.{k}": v for k, v in vars(pop).items() if isinstance(v, np.ndarray) and k not in DERIVED}
+    arrays['pop.compartments'] = pop.compartments.table
+    arrays['contacts.indptr'] = engine.contacts.indptr
+    arrays['contacts.indices'] = engine.contacts.indices
+    arrays['hubs.viral_load'] = engine.hub_load
+
+    heap = engine.transitions.heap
+    arrays['heap.time'] = np.array([e[0] for e in heap], dtype=np.float64)
+    arrays['heap.agent'] = np.array([e[1] for e in heap], dtype=np.int64)
+    arrays['heap.kind'] = np.array([e[2] for e in heap], dtype=np.int8)
+    arrays['heap.gen'] = np.array([e[3] for e in heap], dtype=np.int64)
+    arrays['awaiting.agent'] = np.array(list(engine.awaiting_bed), dtype=np.int64)
+    arrays['awaiting.gen'] = np.array(list(engine.awaiting_bed.values()), dtype=np.int64)
+
+    for k, v in engine.history.columns().items(): arrays[f"history.{k}"] = v
+    for k, v in engine.tree.rows().items(): arrays[f"tree.{k}"] = v
+    arrays['tree.latest'] = engine.tree.latest
+    arrays['uniform.block'] = engine.uniform.block
+    return arrays
+
+def write_arrays(path, meta, arrays):
+    arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    specs, offset = {}, 0
+    for k, v in arrays.items():
+        specs[k] = {'dtype': v.dtype.str, 'shape': list(v.shape), 'offset': offset}
+        offset = align(offset + v.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': specs}).encode()
+    start = align(len(MAGIC) + 8 + len(header))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for k, v in arrays.items():
+            f.seek(start + specs[k]['offset'])
+            f.write(v.tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+class ArrayFile:
+    # Reader for files written by write_arrays. With mmap, arrays are views of
+    # the file opened in `mode` ('c' copy-on-write, 'r' read-only): nothing is
+    # read until touched
+    def __init__(self, path, mmap=True, mode='c'):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC: raise ValueError(f"{path} is not an engine array file")
+            size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(size))
+        self.path = path
+        self.mmap = mmap
+        self.mode = mode
+        self.meta = header['meta']
+        self.specs = header['arrays']
+        self.start = align(len(MAGIC) + 8 + size)
+
+    def __contains__(self, name): return name in self.specs
+
+    def names(self, prefix=''):
+        return [k for k in self.specs if k.startswith(prefix)]
+
+    def get(self, name):
+        spec = self.specs[name]
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        offset = self.start + spec['offset']
+        if not self.mmap or int(np.prod(shape)) == 0:
+            return np.fromfile(self.path, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        return np.memmap(self.path, dtype=dtype, mode=self.mode, offset=offset, shape=shape)
+
+def save(engine, path):
+    meta = {'n': len(engine.pop), 'now': engine.pop.now, 'day': engine.day, 'tick': engine.tick,
+            'tick_count': engine.tick_count, 'sim_time': engine.sim_time,
+            'mortality_key': engine.mortality_key, 'waning_rate': engine.waning_rate, 'demographics': engine.demographics,
+            'world_seed': engine.world_seed,
+            'params': vars(CONFIG), 'rng': engine.rng.bit_generator.state, 'uniform_pos': engine.uniform.pos}
+    write_arrays(path, meta, engine_arrays(engine))
+
+def restore(engine, path, mmap=True):
+    # Agent columns are copy-on-write views of the file, so forks never write back to it
+    f = ArrayFile(path, mmap)
+    meta, array = f.meta, f.get
+
+    CONFIG.__dict__.update(meta['params'])
+    engine.world_seed = meta.get('world_seed')
+    engine.day, engine.tick, engine.tick_count = meta['day'], meta['tick'], meta['tick_count']
+    engine.sim_time = meta['sim_time']
+    engine.mortality_key = tuple(meta['mortality_key']) if meta['mortality_key'] is not None else None
+    engine.waning_rate = meta.get('waning_rate')
+    engine.demographics = dict(meta['demographics'])
+    engine.history = History.from_columns({k[len('history.'):]: array(k) for k in f.names('history.')})
+    engine.tree = TransmissionTree.from_arrays(meta['n'], {k: array(f"tree.{k}") for k in TREE_COLUMNS}, array('tree.latest'))
+
+    engine.transitions = TransitionScheduler()
+    # Saved in heap order, so the list is already a valid heap
+    engine.transitions.heap = list(zip(array('heap.time').tolist(), array('heap.agent').tolist(),
+                                       array('heap.kind').tolist(), array('heap.gen').tolist()))
+    engine.awaiting_bed = dict(zip(array('awaiting.agent').tolist(), array('awaiting.gen').tolist()))
+
+    engine.rng.bit_generator.state = meta['rng']
+    engine.uniform.block = np.array(array('uniform.block'))
+    engine.uniform.pos = meta['uniform_pos']
+
+    engine.build_hubs()
+    engine.hub_load[:] = array('hubs.viral_load')
+
+    pop = Population(meta['n'], engine.hubs, engine.rng)
+    for k in f.names('pop.'):
+        if k != 'pop.compartments': setattr(pop, k[len('pop.'):], array(k))
+    pop.now = meta['now']
+    pop.compartments.table = np.array(array('pop.compartments'))
+    engine.contacts = ContactGraph(meta['n'], array('contacts.indptr'), array('contacts.indices'))
+    pop.contacts = engine.contacts
+    engine.pop = engine.agents = pop
+    if 'pop.moving' not in f:
+        # Saved before movement was event-driven: whoever is off their target
+        # is still on the way, and every weight but the buried's fades on from where it is
+        pop.moving[:] = (pop.sim_pos != pop.target_pos).any(axis=1)
+        engine.start_fade(np.flatnonzero((pop.state != State.DEAD.value) | (pop.current != engine.cemetery.idx)))
+    engine.start_layout()
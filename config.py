@@ -1,4 +1,4 @@
-import pygame
+import os
 
 # Screen & Layout
 WIDTH, HEIGHT = 1600, 900
@@ -9,7 +9,47 @@ FPS = 60
 
 # Physics
 REPULSION_STRENGTH = 2500.0 
+REPULSION_RANGE = 50.0
+MAX_SPEED = 8.0
 DAMPING = 0.85
+WALK_SPEED = 2500.0        # SIM px per day agents travel between hubs (engine and replay)
+DEAD_SPEED = 0.2           # fraction of WALK_SPEED the dead are carried at
+LAYOUT_ITERATIONS = 1
+LAYOUT_EXACT_MAX = 3000
+LAYOUT_MESH_CELL = 8.0
+LAYOUT_THREADED = False
+LAYOUT_ALPHA_DECAY = 0.005
+LAYOUT_FREEZE_ENERGY = 0.01
+LAYOUT_FREEZE_ITERS = 60
+# Generated worlds are cached next to the code (or in $WORLD_CACHE_DIR), least recently used evicted past WORLD_CACHE_MAX files
+WORLD_CACHE_DIR = os.environ.get('WORLD_CACHE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.world_cache')
+WORLD_CACHE_MAX = 16
+WORLD_SEED = 0
+PROFILE_ENABLED = False    # per-phase timers; F3 toggles them in the GUI
+PROFILE_WINDOW = 240       # samples kept per phase for the rolling percentiles
+TELEMETRY_QUEUE = 1024     # records waiting for the writer thread before new ones are dropped
+TELEMETRY_BATCH = 64       # records encoded per write
+EVENTLOG_CHUNK = 1 << 16   # events per compressed event-log chunk
+REPLAY_KEYFRAME_DAYS = 1.0 # replay keeps a full agent snapshot this often for seeking back
+REPLAY_KEYFRAME_BUDGET = 256 << 20  # bytes of compressed keyframes; past it every other one is dropped and the spacing doubles
+RENDER_EDGE_LOD = 10000    # edges per layer above which they are bundled and thinned to about this many
+RENDER_BUNDLE_CELL = 12.0  # px; bundling grid
+RENDER_EDGE_REFRESH = 4    # layout versions between redraws of the static GRAPH edges while it settles
+RENDER_DOT_LOD = 20000     # agents above which dots are drawn a pixel smaller
+SIM_FRAME_BUDGET = 0.012   # s of stepping per frame before the rest is deferred to later frames
+SIM_MAX_BACKLOG = 240      # updates owed before the excess is dropped and the sim runs slow
+SIM_MAX_FRAMESKIP = 0      # frames in a row that may go undrawn while catching up (0: never skip)
+SIM_THREADED = False       # step the engine on its own thread; the renderer interpolates snapshots
+
+# Town size: one hub of each kind per this many people (see Engine.setup_hubs)
+PEOPLE_PER_HOUSEHOLD = 5
+PEOPLE_PER_SCHOOL = 1000
+PEOPLE_PER_WORKPLACE = 1000
+PEOPLE_PER_MARKET = 5000
+PEOPLE_PER_CAFE = 5000
+PEOPLE_PER_PARK = 10000
+PEOPLE_PER_HOSPITAL = 10000
+PEOPLE_PER_QUARANTINE = 20000
 
 # Spring Constants
 K_SOCIAL = 0.01  
@@ -55,6 +95,7 @@ class Params:
         self.init_infected = 3
         self.k_neighbors = 5      
         self.rewire_prob = 0.1    
+        self.graph_model = "small_world"   # small_world | erdos_renyi | household (graphs.MODELS)
         self.social_engagement = 1.0
         
         self.beta = 40.0            
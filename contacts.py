@@ -0,0 +1,47 @@
+import numpy as np
+
+class ContactGraph:
+    # Undirected social graph in CSR form: neighbours of i are indices[indptr[i]:indptr[i+1]]
+    def __init__(self, n, indptr, indices):
+        self.n = n
+        self.indptr = indptr
+        self.indices = indices
+        self._edges = None
+
+    @classmethod
+    def from_edges(cls, n, edges):
+        edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        src = np.concatenate([edges[:, 0], edges[:, 1]])
+        dst = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(n, indptr, dst[order].astype(np.int32))
+
+    def __len__(self): return len(self.indices) // 2
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def edges(self):
+        # Each undirected edge once, as (u, v) with u < v
+        if self._edges is None:
+            src = np.repeat(np.arange(self.n, dtype=np.int32), self.degree())
+            keep = src < self.indices
+            self._edges = np.stack([src[keep], self.indices[keep]], axis=1)
+        return self._edges
+
+    def expand(self, rows):
+        # All directed (row, neighbour) pairs leaving the given rows
+        rows = np.asarray(rows, dtype=np.int64)
+        start = self.indptr[rows]
+        deg = self.indptr[rows + 1] - start
+        total = int(deg.sum())
+        offsets = np.arange(total) - np.repeat(np.cumsum(deg) - deg, deg)
+        return np.repeat(rows, deg), self.indices[np.repeat(start, deg) + offsets]
+
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
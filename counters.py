@@ -0,0 +1,35 @@
+import numpy as np
+from enums import State
+
+N_STATES = len(State)
+
+class Compartments:
+    # Agent counts by (state, vaccinated), kept in step with every write made
+    # through Population.set_state / set_vaccinated so readers never rescan
+    def __init__(self, n):
+        self.table = np.zeros((N_STATES, 2), dtype=np.int64)
+        self.table[State.SUSCEPTIBLE.value, 0] = n
+
+    def move(self, old_state, old_vax, new_state, new_vax):
+        size = self.table.size
+        old = np.bincount(np.asarray(old_state, dtype=np.int64) * 2 + old_vax, minlength=size)
+        new = np.bincount(np.asarray(new_state, dtype=np.int64) * 2 + new_vax, minlength=size)
+        self.table += (new - old).reshape(self.table.shape)
+
+    def __getitem__(self, state):
+        return int(self.table[state.value].sum())
+
+    def count(self, *states):
+        return int(sum(self.table[s.value].sum() for s in states))
+
+    @property
+    def vaccinated(self): return int(self.table[:, 1].sum())
+
+    def unvaccinated(self, state): return int(self.table[state.value, 0])
+
+    @property
+    def active(self): return self.count(State.LATENT, State.INF_ASYMP, State.INF_SYMP, State.HOSPITALIZED)
+
+    def snapshot(self):
+        return {'S': self[State.SUSCEPTIBLE], 'Active': self.active, 'R': self[State.RECOVERED],
+                'D': self[State.DEAD], 'H': self[State.HOSPITALIZED]}
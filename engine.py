@@ -1,451 +1,626 @@
-import pygame
-import random
 import math
-import networkx as nx
+import numpy as np
 from config import *
 from enums import *
-from entities import Hub, Person
+from entities import Hub
+from population import Population, SLOT_HOME, SLOT_ASSIGNED, SLOT_MARKET, SLOT_HOSP, SLOT_QUAR, SLOT_PARK, SLOT_CAFE, SLOT_CEMETERY
+import graphs
+from layout import ForceLayout, LayoutService
+from rng import UniformBlock
+from profiling import Profiler
+import checkpoint
+import worlds
+from history import History
+from eventlog import EventRecorder
+from transitions import TransitionScheduler, ONSET, ADMIT, DEATH, RECOVER, WANE
+from vector import Vector2
+from transmission import TransmissionTree, SOCIAL, SEED
+from schedule import Schedule, day_kind
+
+S, L, IA, IS, H, R, D = (s.value for s in State)
+
+def ring_points(k, radius):
+    angle = np.arange(k) * (2 * math.pi / max(k, 1))
+    return np.stack([CENTER_X + np.cos(angle) * radius, CENTER_Y + np.sin(angle) * radius], axis=1)
+
+def weighted_draw(keys, weights, queries, u):
+    # For each query key, the index of one element with that key, drawn with
+    # probability proportional to its weight; queried keys need positive weight
+    order = np.argsort(keys, kind='stable')
+    ks, ws = keys[order], weights[order]
+    cum = np.cumsum(ws)
+    first = np.searchsorted(ks, queries, 'left')
+    last = np.searchsorted(ks, queries, 'right') - 1
+    start = cum[first] - ws[first]
+    at = np.searchsorted(cum, start + u * (cum[last] - start), 'right')
+    return order[np.clip(at, first, last)]
+
+def spiral_points(k, r0, r1):
+    # Sunflower spiral: k evenly spread points over the annulus r0..r1
+    t = (np.arange(k) + 0.5) / k
+    rad = np.sqrt(r0 ** 2 + t * (r1 ** 2 - r0 ** 2))
+    angle = np.arange(k) * math.pi * (3 - math.sqrt(5))
+    return np.stack([CENTER_X + np.cos(angle) * rad, CENTER_Y + np.sin(angle) * rad], axis=1)
 
 class Engine:
-    def __init__(self):
+    def __init__(self, headless=False, seed=None, checkpoint=None, world_seed=None):
+        self.headless = headless
+        # With a world seed the static world is shared through the on-disk cache
+        self.world_seed = world_seed
+        self.rng = np.random.default_rng(seed)
+        self.uniform = UniformBlock(self.rng)
+        self.profiler = Profiler(PROFILE_ENABLED, PROFILE_WINDOW)
+        self.telemetry = None
+        self.recorder = None
         self.hubs = []
+        self.pop = None
+        self.layout = None
         self.agents = []
         self.view_mode = "SIM" 
         self.tick = 0
         self.day = 0
         self.tick_count = 0
         self.paused = False
-        self.history = {'S':[], 'Active':[], 'R':[], 'D':[], 'H':[]}
+        self.history = History()
         self.demographics = {'Child':0, 'Adult':0, 'Senior':0, 'HighMob':0, 'ModMob':0, 'LowMob':0}
-        self.init_world()
+        if checkpoint: self.load(checkpoint)
+        else: self.init_world()
 
     def init_world(self):
-        self.hubs = []
-        self.agents = []
         self.tick = 0
         self.day = 0
         self.tick_count = 0
-        self.history = {'S':[], 'Active':[], 'R':[], 'D':[], 'H':[]}
+        self.sim_time = 0.0
+        self.transitions = TransitionScheduler()
+        self.mortality_key = None
+        self.waning_rate = None
+        self.awaiting_bed = {}
+        self.history = History()
         self.demographics = {'Child':0, 'Adult':0, 'Senior':0, 'HighMob':0, 'ModMob':0, 'LowMob':0}
         
-        self.setup_hubs()
+        self.build_hubs()
 
         total_pop = int(CONFIG.pop_size)
-        for i in range(total_pop):
-            home = self.households[i % len(self.households)]
-            r = random.random()
-            if r < 0.2: age, mob = AgeGroup.CHILD, MobilityType.HIGH
-            elif r < 0.75: age, mob = AgeGroup.ADULT, random.choice([MobilityType.HIGH, MobilityType.MODERATE])
-            else: age, mob = AgeGroup.SENIOR, MobilityType.LOW
-            
-            if age == AgeGroup.CHILD: self.demographics['Child'] += 1
-            elif age == AgeGroup.ADULT: self.demographics['Adult'] += 1
-            else: self.demographics['Senior'] += 1
-            
-            if mob == MobilityType.HIGH: self.demographics['HighMob'] += 1
-            elif mob == MobilityType.MODERATE: self.demographics['ModMob'] += 1
-            else: self.demographics['LowMob'] += 1
-            
-            p = Person(i, home, age, mob)
-            
-            if age == AgeGroup.CHILD: p.assigned_hub = random.choice(self.schools)
-            elif age == AgeGroup.ADULT and mob != MobilityType.LOW: p.assigned_hub = random.choice(self.works)
-            else: p.assigned_hub = None 
-            
-            p.permanent_affiliations.append(home)
-            if p.assigned_hub:
-                p.permanent_affiliations.append(p.assigned_hub)
-
-            p.structural_edges[home] = 1.0 
-            if p.assigned_hub: p.structural_edges[p.assigned_hub] = 0.0
-            
-            p.structural_edges[self.market] = 0.0
-            p.structural_edges[self.hosp] = 0.0
-            p.structural_edges[self.quar] = 0.0
-            if self.park: p.structural_edges[self.park] = 0.0
-            if self.cafe: p.structural_edges[self.cafe] = 0.0
-            p.structural_edges[self.cemetery] = 0.0
-
-            self.agents.append(p)
-
-        try:
-            G = nx.watts_strogatz_graph(n=total_pop, k=CONFIG.k_neighbors, p=CONFIG.rewire_prob)
-        except:
-            G = nx.erdos_renyi_graph(n=total_pop, p=0.05)
-        
-        for u, v in G.edges:
-            self.agents[u].graph_neighbors.append(self.agents[v])
-            self.agents[v].graph_neighbors.append(self.agents[u])
+        pop = Population(total_pop, self.hubs, self.rng)
+        self.pop = pop
+        self.agents = pop
+        if self.world_seed is None: self.generate_world(self.rng)
+        else: worlds.load_or_build(self, self.world_seed)
+
+        self.demographics['Child'] = int((pop.age == AgeGroup.CHILD.value).sum())
+        self.demographics['Adult'] = int((pop.age == AgeGroup.ADULT.value).sum())
+        self.demographics['Senior'] = int((pop.age == AgeGroup.SENIOR.value).sum())
+        mob_counts = np.bincount(pop.mobility, minlength=3)
+        self.demographics['HighMob'] = int(mob_counts[MobilityType.HIGH.value])
+        self.demographics['ModMob'] = int(mob_counts[MobilityType.MODERATE.value])
+        self.demographics['LowMob'] = int(mob_counts[MobilityType.LOW.value])
+
+        pop.superspreader[:] = self.rng.random(total_pop) < CONFIG.superspreader_prob
+        pop.masked[:] = self.rng.random(total_pop) < CONFIG.mask_compliance
+
+        pop.target[:] = pop.home
+        pop.current[:] = pop.home
+        pop.sim_pos[:] = pop.random_points(pop.home)
+        pop.target_pos[:] = pop.sim_pos
+        pop.graph_pos[:] = self.hub_graph_pos[pop.home]
+
+        pop.edge_w[:, SLOT_HOME] = 1.0
+
+        pop.contacts = self.contacts
+        self.start_layout()
+
+        self.tree = TransmissionTree(total_pop)
+        seeds = self.rng.choice(total_pop, min(int(CONFIG.init_infected), total_pop), replace=False)
+        self.infect_agents(seeds)
+
+    def generate_world(self, rng):
+        # The static part of a world: households, demographics, school/work
+        # assignment and the contact graph. Everything drawn here comes from
+        # `rng`, so a world seed reproduces it exactly (see worlds.py)
+        pop = self.pop
+        total_pop = len(pop)
+        homes = np.array([h.idx for h in self.households], dtype=np.int32)
+        pop.home[:] = homes[np.arange(total_pop) % len(homes)]
+
+        r = rng.random(total_pop)
+        child, senior = r < 0.2, r >= 0.75
+        adult = ~child & ~senior
+        pop.age[child] = AgeGroup.CHILD.value
+        pop.age[adult] = AgeGroup.ADULT.value
+        pop.age[senior] = AgeGroup.SENIOR.value
+        pop.mobility[child] = MobilityType.HIGH.value
+        pop.mobility[adult] = np.where(rng.random(adult.sum()) < 0.5, MobilityType.HIGH.value, MobilityType.MODERATE.value)
+        pop.mobility[senior] = MobilityType.LOW.value
+
+        base_const = np.array([0.8, 0.6, 0.3], dtype=np.float32)[pop.age]
+        pop.constitution[:] = np.clip(base_const + rng.uniform(-0.15, 0.15, total_pop), 0.1, 1.0)
+
+        schools = np.array([h.idx for h in self.schools], dtype=np.int32)
+        works = np.array([h.idx for h in self.works], dtype=np.int32)
+        pop.assigned[child] = schools[rng.integers(len(schools), size=child.sum())]
+        worker = adult & (pop.mobility != MobilityType.LOW.value)
+        pop.assigned[worker] = works[rng.integers(len(works), size=worker.sum())]
+
+        # Each household shares one local hub of every shared kind, dealt out
+        # round-robin in shuffled order so the hubs are evenly loaded
+        house = pop.home - self.households[0].idx
+        pop.edge_hub[:, SLOT_HOME] = pop.home
+        pop.edge_hub[:, SLOT_ASSIGNED] = pop.assigned
+        for slot, hubs in ((SLOT_MARKET, self.markets), (SLOT_HOSP, self.hospitals), (SLOT_QUAR, self.quarantines),
+                           (SLOT_PARK, self.parks), (SLOT_CAFE, self.cafes)):
+            idx = np.array([h.idx for h in hubs], dtype=np.int32)
+            pop.edge_hub[:, slot] = idx[rng.permutation(np.arange(len(self.households)) % len(idx))][house]
+        pop.edge_hub[:, SLOT_CEMETERY] = self.cemetery.idx
+
+        self.contacts = graphs.generate(CONFIG.graph_model, total_pop, CONFIG.k_neighbors, CONFIG.rewire_prob, rng, pop.home)
+
+    def build_hubs(self):
+        self.hubs = []
+        self.setup_hubs()
+        # Hubs read their viral load from this array rather than being updated one by one
+        self.hub_load = np.zeros(len(self.hubs))
+        for i, h in enumerate(self.hubs):
+            h.idx = i
+            h.loads = self.hub_load
+        self.hub_graph_pos = np.array([(h.graph_pos.x, h.graph_pos.y) for h in self.hubs], dtype=np.float32)
+        self.hub_capacity = np.array([h.capacity for h in self.hubs], dtype=np.float64)
+        self.hub_risk = np.array([h.risk_mult for h in self.hubs], dtype=np.float64)
+        self.hub_type = np.array([h.type.value for h in self.hubs], dtype=np.int8)
+        self.schedule = Schedule([h.idx for h in self.households])
+
+    def start_layout(self):
+        if self.layout: self.layout.stop()
+        self.layout = None if self.headless else LayoutService(ForceLayout(self.pop, self.hub_graph_pos, self.contacts, rng=self.rng.spawn(1)[0]))
+
+    def save(self, path):
+        checkpoint.save(self, path)
+
+    def load(self, path, mmap=True):
+        checkpoint.restore(self, path, mmap)
+
+    def record(self, path):
+        # Log every state, vaccination and target change from here on (eventlog.py)
+        self.recorder = EventRecorder(path, self)
+        self.pop.recorder = self.recorder
 
-        seeds = random.sample(self.agents, min(int(CONFIG.init_infected), len(self.agents)))
-        for p in seeds:
-            self.infect_agent(p)
+    def reseed(self, seed):
+        # Fresh random stream from the current state, for branching a checkpoint
+        self.rng = np.random.default_rng(seed)
+        self.uniform = UniformBlock(self.rng)
+        self.pop.rng = self.rng
 
     def setup_hubs(self):
+        # Every hub type but the cemetery scales with population from the
+        # PEOPLE_PER_* ratios; up to 2000 people this is the original town
+        n = int(CONFIG.pop_size)
+        count = lambda per, least: max(least, math.ceil(n / per))
+
         self.market = Hub(0, CENTER_X, CENTER_Y, 70, LocationType.MARKET, "MARKET", 400, 1.5)
         self.hubs.append(self.market)
-        
-        ring_items = [
-            (LocationType.SCHOOL, "SCHOOL 1", 300, 2.0),
-            (LocationType.SCHOOL, "SCHOOL 2", 300, 2.0),
-            (LocationType.WORKPLACE, "OFFICE", 100, 1.2),
-            (LocationType.WORKPLACE, "FACTORY", 100, 1.2),
-            (LocationType.CAFE, "CAFE", 500, 1.5),
-            (LocationType.PARK, "PARK", 800, 0.2)
-        ]
-        
+        self.markets = [self.market]
+
+        n_school, n_work = count(PEOPLE_PER_SCHOOL, 2), count(PEOPLE_PER_WORKPLACE, 2)
+        n_cafe, n_park = count(PEOPLE_PER_CAFE, 1), count(PEOPLE_PER_PARK, 1)
+        ring_items = [(LocationType.SCHOOL, f"SCHOOL {i+1}", 300, 2.0) for i in range(n_school)]
+        ring_items += [(LocationType.WORKPLACE, ("OFFICE", "FACTORY")[i % 2] + (f" {i//2+1}" if i >= 2 else ""), 100, 1.2) for i in range(n_work)]
+        ring_items += [(LocationType.CAFE, "CAFE" + (f" {i+1}" if i else ""), 500, 1.5) for i in range(n_cafe)]
+        ring_items += [(LocationType.PARK, "PARK" + (f" {i+1}" if i else ""), 800, 0.2) for i in range(n_park)]
+        ring_items += [(LocationType.MARKET, f"MARKET {i+2}", 400, 1.5) for i in range(count(PEOPLE_PER_MARKET, 1) - 1)]
+
         self.schools = []
         self.works = []
-        self.cafe = None 
-        self.park = None 
-        
-        sim_rad = 180 
-        angle_step = (2 * math.pi) / len(ring_items)
-        
+        self.cafes = []
+        self.parks = []
+
+        # A single ring while they fit, otherwise a spiral filling the inner disc
+        if len(ring_items) <= 12: sim, radius = ring_points(len(ring_items), 180), 50
+        else: sim, radius = spiral_points(len(ring_items), 100, 240), max(6, int(50 * math.sqrt(12 / len(ring_items))))
+        graph = ring_points(len(ring_items), RING_RAD_MID)
+
         for i, (l_type, lbl, cap, risk) in enumerate(ring_items):
-            angle = i * angle_step
-            sx = CENTER_X + math.cos(angle) * sim_rad
-            sy = CENTER_Y + math.sin(angle) * sim_rad
-            gx = CENTER_X + math.cos(angle) * RING_RAD_MID
-            gy = CENTER_Y + math.sin(angle) * RING_RAD_MID
-            
-            h = Hub(i+1, sx, sy, 50, l_type, lbl, cap, risk)
-            h.graph_pos = pygame.math.Vector2(gx, gy)
-            
+            h = Hub(len(self.hubs), sim[i, 0], sim[i, 1], radius, l_type, lbl, cap, risk)
+            h.graph_pos = Vector2(graph[i, 0], graph[i, 1])
+
             if l_type == LocationType.SCHOOL: self.schools.append(h)
             elif l_type == LocationType.WORKPLACE: self.works.append(h)
-            elif l_type == LocationType.CAFE: self.cafe = h  
-            elif l_type == LocationType.PARK: self.park = h
+            elif l_type == LocationType.CAFE: self.cafes.append(h)
+            elif l_type == LocationType.PARK: self.parks.append(h)
+            elif l_type == LocationType.MARKET: self.markets.append(h)
             self.hubs.append(h)
 
-        hosp = Hub(900, 900, 150, 60, LocationType.HOSPITAL, "HOSPITAL", 50, 0.5)
-        hosp.sim_pos = pygame.math.Vector2(SIM_W - 100, 150)
-        gx = CENTER_X + math.cos(math.radians(-135)) * RING_RAD_FAR
-        gy = CENTER_Y + math.sin(math.radians(-135)) * RING_RAD_FAR
-        hosp.graph_pos = pygame.math.Vector2(gx, gy)
-        self.hosp = hosp
-        self.hubs.append(hosp)
-        
-        quar = Hub(902, 100, 150, 60, LocationType.QUARANTINE, "QUARANTINE", 200, 0.1)
-        quar.sim_pos = pygame.math.Vector2(100, 150)
-        gx = CENTER_X + math.cos(math.radians(-45)) * RING_RAD_FAR
-        gy = CENTER_Y + math.sin(math.radians(-45)) * RING_RAD_FAR
-        quar.graph_pos = pygame.math.Vector2(gx, gy)
-        self.quar = quar
-        self.hubs.append(quar)
-        
-        cem = Hub(901, SIM_W - 100, 100, 70, LocationType.CEMETERY, "CEMETERY", 5000, 0.0)
-        cem.sim_pos = pygame.math.Vector2(SIM_W - 100, HEIGHT - 100)
+        self.hospitals = self.corner_hubs(count(PEOPLE_PER_HOSPITAL, 1), (SIM_W - 100, 150), -135,
+                                          LocationType.HOSPITAL, "HOSPITAL", 50, 0.5)
+        self.quarantines = self.corner_hubs(count(PEOPLE_PER_QUARANTINE, 1), (100, 150), -45,
+                                            LocationType.QUARANTINE, "QUARANTINE", 200, 0.1)
+        self.hosp_capacity = sum(h.capacity for h in self.hospitals)
+
+        cem = Hub(len(self.hubs), SIM_W - 100, HEIGHT - 100, 70, LocationType.CEMETERY, "CEMETERY", 5000, 0.0)
         gx = CENTER_X + math.cos(math.radians(45)) * RING_RAD_FAR
         gy = CENTER_Y + math.sin(math.radians(45)) * RING_RAD_FAR
-        cem.graph_pos = pygame.math.Vector2(gx, gy)
+        cem.graph_pos = Vector2(gx, gy)
         self.cemetery = cem
         self.hubs.append(cem)
 
+        # Households fill the three original rings, then switch to a spiral
+        # over the same annulus with houses shrunk to fit
         self.households = []
-        houses_needed = max(10, int(CONFIG.pop_size / 5))
-        
-        sim_rings = [290, 345, 400] 
-        houses_placed = 0
-        sim_positions = []
-        
-        for rad in sim_rings:
-            if houses_placed >= houses_needed: break
-            circ = 2 * math.pi * rad
-            cap = int(circ / (14 * 2.5)) 
-            to_place = min(cap, houses_needed - houses_placed)
-            angle_step = (2 * math.pi) / to_place if to_place > 0 else 0
-            
-            for i in range(to_place):
-                angle = i * angle_step
-                x = CENTER_X + math.cos(angle) * rad
-                y = CENTER_Y + math.sin(angle) * rad
-                sim_positions.append(pygame.math.Vector2(x, y))
-            houses_placed += to_place
-            
-        graph_angle_step = (2 * math.pi) / len(sim_positions)
-        
-        for i in range(len(sim_positions)):
-            sp = sim_positions[i]
-            g_angle = i * graph_angle_step
-            gx = CENTER_X + math.cos(g_angle) * RING_RAD_OUTER
-            gy = CENTER_Y + math.sin(g_angle) * RING_RAD_OUTER
-            
-            h = Hub(200+i, sp.x, sp.y, 14, LocationType.HOUSEHOLD, "", 20, 1.5)
-            h.sim_pos = sp
-            h.graph_pos = pygame.math.Vector2(gx, gy)
-            
+        houses_needed = max(10, math.ceil(n / PEOPLE_PER_HOUSEHOLD))
+        sim_rings = [290, 345, 400]
+        caps = [int(2 * math.pi * rad / (14 * 2.5)) for rad in sim_rings]
+        if houses_needed <= sum(caps):
+            parts, left = [], houses_needed
+            for rad, cap in zip(sim_rings, caps):
+                if left <= 0: break
+                parts.append(ring_points(min(cap, left), rad))
+                left -= cap
+            sim, radius = np.concatenate(parts), 14
+        else:
+            sim = spiral_points(houses_needed, 280, 410)
+            radius = max(3, min(14, 0.45 * math.sqrt(math.pi * (410 ** 2 - 280 ** 2) / houses_needed)))
+        graph = ring_points(houses_needed, RING_RAD_OUTER)
+
+        base = len(self.hubs)
+        for i, ((sx, sy), (gx, gy)) in enumerate(zip(sim.tolist(), graph.tolist())):
+            h = Hub(base + i, sx, sy, radius, LocationType.HOUSEHOLD, "", 20, 1.5)
+            h.graph_pos = Vector2(gx, gy)
             self.hubs.append(h)
             self.households.append(h)
 
-    def infect_agent(self, p):
-        p.state = State.LATENT
-        p.days_in_state = 0
-        p.latent_dur = max(0.5, random.gauss(CONFIG.latent_mean, 1.0))
-        p.inf_dur = max(2.0, random.gauss(CONFIG.inf_mean, 2.0))
-        base_shed = CONFIG.shedding_asymp
-        if p.is_superspreader: base_shed *= 3.0
-        p.peak_shedding = base_shed 
+    def corner_hubs(self, k, corner, angle, l_type, label, cap, risk):
+        # k hubs packed into a square around a screen corner, fanned out on
+        # the far graph ring around `angle`
+        side = math.ceil(math.sqrt(k))
+        radius = 60 if k == 1 else max(6, int(110 / side) - 2)
+        step = 2 * radius + 4
+        spread = min(10.0, 60.0 / k)
+        out = []
+        for i in range(k):
+            row, col = divmod(i, side)
+            sx = corner[0] + (col - (side - 1) / 2) * step
+            sy = corner[1] + (row - (side - 1) / 2) * step
+            h = Hub(len(self.hubs), sx, sy, radius, l_type, label + (f" {i+1}" if k > 1 else ""), cap, risk)
+            a = math.radians(angle + (i - (k - 1) / 2) * spread)
+            h.graph_pos = Vector2(CENTER_X + math.cos(a) * RING_RAD_FAR, CENTER_Y + math.sin(a) * RING_RAD_FAR)
+            self.hubs.append(h)
+            out.append(h)
+        return out
+
+    def infect_agents(self, idx, parent=-1, setting=SEED, hub=-1):
+        pop = self.pop
+        k = len(idx)
+        pop.set_state(idx, L)
+        pop.state_since[idx] = self.sim_time
+        pop.latent_dur[idx] = np.maximum(0.5, self.rng.normal(CONFIG.latent_mean, 1.0, k))
+        pop.inf_dur[idx] = np.maximum(2.0, self.rng.normal(CONFIG.inf_mean, 2.0, k))
+        pop.peak_shedding[idx] = CONFIG.shedding_asymp * np.where(pop.superspreader[idx], 3.0, 1.0)
+        pop.gen[idx] += 1
+        self.tree.add(idx, parent, self.sim_time, setting, hub)
+        self.transitions.push(self.sim_time + pop.latent_dur[idx], idx, ONSET, pop.gen[idx])
 
-    def update(self):
+    def update(self, scale=None):
+        # One step of DAYS_PER_UPDATE * scale days. The GUI always takes unit
+        # steps and gets its speed from running more of them (see stepper.py);
+        # batch runs default to CONFIG.sim_speed, trading accuracy for speed
         if self.paused: return
 
-        dt_days = DAYS_PER_UPDATE * CONFIG.sim_speed
-        
-        current_vaxxed = sum(1 for p in self.agents if p.vaccinated)
-        target_vaxxed = int(len(self.agents) * CONFIG.vaccine_rate)
+        scale = CONFIG.sim_speed if scale is None else scale
+        dt_days = DAYS_PER_UPDATE * scale
+        pop = self.pop
         
-        if current_vaxxed < target_vaxxed:
-            candidates = [p for p in self.agents if not p.vaccinated and p.state == State.SUSCEPTIBLE]
-            if candidates:
-                to_vax = random.sample(candidates, min(len(candidates), max(1, int(5 * CONFIG.sim_speed))))
-                for p in to_vax: p.vaccinated = True
-        elif current_vaxxed > target_vaxxed:
-            vaxxed = [p for p in self.agents if p.vaccinated]
-            to_unvax = random.sample(vaxxed, min(len(vaxxed), max(1, int(5 * CONFIG.sim_speed))))
-            for p in to_unvax: p.vaccinated = False
-
-        self.tick_count += 1 * CONFIG.sim_speed
-        if self.tick_count >= UPDATES_PER_TICK:
+        comp = pop.compartments
+        prof = self.profiler
+        with prof.phase('vaccination'):
+            current_vaxxed = comp.vaccinated
+            target_vaxxed = int(len(pop) * CONFIG.vaccine_rate)
+            step = max(1, int(5 * scale))
+
+            if current_vaxxed < target_vaxxed:
+                pool = comp.unvaccinated(State.SUSCEPTIBLE)
+                pop.set_vaccinated(pop.sample(lambda i: ~pop.vaccinated[i] & (pop.state[i] == S), pool, step), True)
+            elif current_vaxxed > target_vaxxed:
+                pop.set_vaccinated(pop.sample(lambda i: pop.vaccinated[i], current_vaxxed, step), False)
+
+        self.tick_count += scale
+        ticked = self.tick_count >= UPDATES_PER_TICK
+        if ticked:
             self.tick_count = 0
             self.tick += 1
             if self.tick > 2:
                 self.tick = 0
                 self.day += 1
-            self.apply_schedule()
-
-        for h in self.hubs: 
-            h.agents_present = [] 
-            h.temp_viral_load = 0.0 
-        
-        for p in self.agents:
-            p.move_spatial(dt_days)
-            if p.current_hub: p.current_hub.agents_present.append(p)
-            
-        self.apply_spring_physics()
-        for p in self.agents:
-            p.update_physics()
+            with prof.phase('schedule'): self.apply_schedule()
 
-        self.process_graph_transmission(dt_days)
+        with prof.phase('movement'): self.move_spatial(dt_days)
+        with prof.phase('transmission'): self.process_graph_transmission(dt_days)
 
-        self.hosp.occupied_beds = sum(1 for p in self.agents if p.state == State.HOSPITALIZED)
-        for p in self.agents:
-            self.update_bio(p, dt_days)
+        self.sim_time += dt_days
+        pop.now = self.sim_time
+        with prof.phase('bio'): self.update_bio(dt_days)
+        if ticked and self.telemetry:
+            with prof.phase('telemetry'): self.telemetry.emit(self)
 
         if int(self.tick_count) % 40 == 0:
-            c = {'S':0, 'Active':0, 'R':0, 'D':0, 'H':0}
-            for p in self.agents:
-                if p.state == State.SUSCEPTIBLE: c['S']+=1
-                elif p.state in [State.LATENT, State.INF_ASYMP, State.INF_SYMP]: c['Active']+=1
-                elif p.state == State.HOSPITALIZED: 
-                    c['Active']+=1
-                    c['H']+=1
-                elif p.state == State.RECOVERED: c['R']+=1
-                elif p.state == State.DEAD: c['D']+=1
-            for k, v in c.items(): self.history[k].append(v)
-            if len(self.history['S']) > PANEL_W - 40:
-                for k in self.history: self.history[k].pop(0)
-
-    def safe_normalize(self, v):
-        if v.length_squared() < 0.0001:
-            return pygame.math.Vector2(random.uniform(-0.1, 0.1), random.uniform(-0.1, 0.1))
-        return v.normalize()
-
-    def apply_spring_physics(self):
-        grid_size = 60
-        grid = {}
-        for p in self.agents:
-            k = (int(p.graph_pos.x/grid_size), int(p.graph_pos.y/grid_size))
-            if k not in grid: grid[k] = []
-            grid[k].append(p)
-            
-        for p in self.agents:
-            # 1. Structural
-            for hub in p.permanent_affiliations:
-                diff = hub.graph_pos - p.graph_pos
-                dist = diff.length()
-                if dist > 0:
-                    k_val = K_HOME if hub.type == LocationType.HOUSEHOLD else K_WORK
-                    force = self.safe_normalize(diff) * ((dist - L_STRUCT) * k_val)
-                    p.acc += force
-
-            # 2. Social
-            for friend in p.graph_neighbors:
-                diff = friend.graph_pos - p.graph_pos
-                dist = diff.length()
-                if dist > 0:
-                    force = self.safe_normalize(diff) * ((dist - L_SOCIAL) * K_SOCIAL)
-                    p.acc += force
-            
-            # 3. Repulsion
-            gx, gy = int(p.graph_pos.x/grid_size), int(p.graph_pos.y/grid_size)
-            for dx in [-1,0,1]:
-                for dy in [-1,0,1]:
-                    neighbors = grid.get((gx+dx, gy+dy), [])
-                    for other in neighbors:
-                        if p == other: continue
-                        diff = p.graph_pos - other.graph_pos
-                        dist_sq = diff.length_squared()
-                        if dist_sq < 1: dist_sq = 1
-                        if dist_sq > 2500: continue 
-                        strength = REPULSION_STRENGTH
-                        if p.home == other.home: strength *= 0.1 
-                        force_mag = strength / dist_sq
-                        p.acc += self.safe_normalize(diff) * force_mag
+            with prof.phase('history'): self.history.append(comp.snapshot())
+
+    def move_spatial(self, dt):
+        # Only agents with somewhere to go are touched. Leaving a hub and
+        # reaching the target are events that set `current` and restart the
+        # agent's edge-weight fade; the fade itself is a function of time
+        pop = self.pop
+        idx = np.flatnonzero(pop.moving)
+        if len(idx):
+            diff = pop.target_pos[idx] - pop.sim_pos[idx]
+            dist = np.hypot(diff[:, 0], diff[:, 1])
+            step_dist = np.where(pop.state[idx] == D, DEAD_SPEED, 1.0) * WALK_SPEED * dt
+            arrive = dist <= step_dist
+            go = ~arrive
+            travel = idx[go]
+            pop.sim_pos[travel] += diff[go] * (step_dist[go] / dist[go])[:, None].astype(np.float32)
+            self.depart(travel[pop.current[travel] >= 0])
+            self.arrive(idx[arrive])
+        self.fade_edges(self.sim_time + dt)
+
+    def depart(self, idx):
+        self.pop.current[idx] = -1
+        self.start_fade(idx)
+
+    def arrive(self, idx):
+        pop = self.pop
+        pop.sim_pos[idx] = pop.target_pos[idx]
+        pop.current[idx] = pop.target[idx]
+        pop.moving[idx] = False
+        # The dead keep the weights they reach the cemetery with
+        buried = (pop.state[idx] == D) & (pop.current[idx] == self.cemetery.idx)
+        pop.fading[idx[buried]] = False
+        self.start_fade(idx[~buried])
+
+    def start_fade(self, idx):
+        # Structural edge weights move at 5 per day towards 1 for the hub the
+        # agent is now at and 0 elsewhere, so each fade has a known end time
+        pop = self.pop
+        cur = pop.current[idx, None]
+        goal = ((pop.edge_hub[idx] == cur) & (cur >= 0)).astype(np.float32)
+        pop.fade_from[idx] = pop.edge_w[idx]
+        pop.fade_gap[idx] = goal - pop.edge_w[idx]
+        pop.fade_start[idx] = self.sim_time
+        pop.fade_end[idx] = self.sim_time + np.abs(pop.fade_gap[idx]).max(axis=1) / 5.0
+        pop.fading[idx] = True
+
+    def fade_edges(self, t):
+        # Interpolate the fading rows to time t; a row drops out once its end time passes
+        pop = self.pop
+        rows = np.flatnonzero(pop.fading)
+        if len(rows) == 0: return
+        reach = (5.0 * (t - pop.fade_start[rows]))[:, None].astype(np.float32)
+        pop.edge_w[rows] = pop.fade_from[rows] + np.clip(pop.fade_gap[rows], -reach, reach)
+        pop.fading[rows[pop.fade_end[rows] <= t]] = False
+
+    def susceptibility(self, idx):
+        pop = self.pop
+        sus = 1.0 - (pop.current_immunity(idx) * CONFIG.immunity_efficacy + pop.constitution[idx] * 0.2)
+        sus = np.where(pop.vaccinated[idx], sus * (1.0 - CONFIG.vaccine_efficacy), sus)
+        sus = np.where(pop.masked[idx], sus * (1.0 - CONFIG.mask_efficacy), sus)
+        return np.maximum(0, sus)
 
     def process_graph_transmission(self, dt):
-        for p in self.agents:
-            shedding = p.get_shedding()
-            if shedding > 0:
-                for hub, weight in p.structural_edges.items():
-                    if weight > 0.1:
-                        hub.temp_viral_load += (shedding * weight)
+        pop = self.pop
+        n_hubs = len(self.hubs)
+        shedding = pop.shedding()
+        infectors = np.flatnonzero(shedding > 0)
+        if len(infectors) == 0:
+            self.hub_load[:] = 0.0
+            return
+
+        # Hub viral load: every (shedder, structural slot) pair in one bincount
+        shed_hub, w = pop.edge_hub[infectors], pop.edge_w[infectors]
+        shed_m = (w > 0.1) & (shed_hub >= 0)
+        shed = (shedding[infectors][:, None] * w)[shed_m]
+        load = np.bincount(shed_hub[shed_m], weights=shed, minlength=n_hubs)
+        self.hub_load[:] = load
         
         distancing_factor = 1.0
         if CONFIG.social_engagement < 0.4:
             distancing_factor = 0.2 
-        
-        for p in self.agents:
-            if p.state != State.SUSCEPTIBLE: continue
-            
-            for hub, weight in p.structural_edges.items():
-                if weight > 0.1 and hub.temp_viral_load > 0:
-                    risk = (hub.temp_viral_load / (hub.capacity + 1)) 
-                    risk *= hub.risk_mult * CONFIG.beta * 0.5 * distancing_factor * weight
-                    prob = 1.0 - math.exp(-risk * dt)
-                    self.try_infect(p, prob)
-
-        infectors = [p for p in self.agents if p.get_shedding() > 0]
-        for infector in infectors:
-            shedding = infector.get_shedding()
-            for neighbor in infector.graph_neighbors:
-                if neighbor.state != State.SUSCEPTIBLE: continue
-                
-                prob_val = shedding * CONFIG.beta * distancing_factor
-                dist = infector.sim_pos.distance_to(neighbor.sim_pos)
-                decay = 1.0 / (1.0 + (dist / CONFIG.kappa) ** 2)
-                
-                if infector.current_hub and neighbor.current_hub:
-                     if infector.current_hub == neighbor.current_hub:
-                         prob_val *= 5.0 
-                
-                final_prob = 1.0 - math.exp(-prob_val * decay * dt)
-                self.try_infect(neighbor, final_prob)
-
-    def try_infect(self, target, prob):
-        sus_factor = 1.0 - (target.immunity * CONFIG.immunity_efficacy + target.constitution * 0.2)
-        if target.vaccinated: sus_factor *= (1.0 - CONFIG.vaccine_efficacy)
-        if target.masked: sus_factor *= (1.0 - CONFIG.mask_efficacy)
-        if random.random() < prob * max(0, sus_factor):
-            self.infect_agent(target)
-
-    def update_bio(self, p, dt):
-        if p.immunity > 0:
-            p.immunity *= math.exp(-CONFIG.immunity_waning * dt)
-            if p.immunity < 0.2 and p.state == State.RECOVERED:
-                p.state = State.SUSCEPTIBLE
-                p.immunity = 0.0
-        
-        if p.state == State.DEAD: return
-        p.days_in_state += dt
-
-        if p.state == State.LATENT:
-            if p.days_in_state >= p.latent_dur:
-                p.state = State.INF_SYMP
-                prob_asymp = CONFIG.asymp_prob
-                if p.vaccinated: prob_asymp += 0.4
-                if p.age == AgeGroup.CHILD: prob_asymp += 0.2
-                if p.age == AgeGroup.SENIOR: prob_asymp -= 0.2
-                
-                if random.random() < prob_asymp:
-                    p.state = State.INF_ASYMP
-                    p.peak_shedding = CONFIG.shedding_asymp
-                else:
-                    p.state = State.INF_SYMP
-                    p.peak_shedding = CONFIG.shedding_symp
-                    if not p.in_quarantine and random.random() < CONFIG.quarantine_rate:
-                        p.in_quarantine = True
-                        p.set_target(self.quar)
-                if p.is_superspreader: p.peak_shedding *= 3.0
-                p.days_in_state = 0
-        
-        elif p.state in [State.INF_SYMP, State.INF_ASYMP, State.HOSPITALIZED]:
-            if p.state == State.INF_SYMP and p.days_in_state > 2.0:
-                if p.constitution < 0.4 or p.age == AgeGroup.SENIOR:
-                    if p.state != State.HOSPITALIZED:
-                        if self.hosp.occupied_beds < self.hosp.capacity:
-                            p.state = State.HOSPITALIZED
-                            p.in_quarantine = False 
-                            p.set_target(self.hosp)
-                            p.hospital_stay_dur = max(2.0, random.gauss(CONFIG.hosp_stay_mean, 2.0))
-
-            hazard = CONFIG.base_mortality
-            if p.vaccinated: hazard *= 0.1
-            if p.state == State.HOSPITALIZED: hazard *= CONFIG.hosp_mortality_mult
-            elif p.state == State.INF_SYMP and (p.constitution < 0.4 or p.age == AgeGroup.SENIOR):
-                 if self.hosp.occupied_beds >= self.hosp.capacity: hazard *= CONFIG.no_bed_mult
-            if p.age == AgeGroup.SENIOR: hazard *= 3.0
-            if p.age == AgeGroup.CHILD: hazard *= 0.1
-            
-            p_die = 1.0 - math.exp(-hazard * dt)
-            if random.random() < p_die:
-                p.state = State.DEAD
-                p.in_quarantine = False
-                p.set_target(self.cemetery)
-            elif p.days_in_state >= p.inf_dur:
-                p.state = State.RECOVERED
-                p.immunity = 1.0
-                p.in_quarantine = False
-                if p.current_hub == self.hosp or p.current_hub == self.quar: p.set_target(p.home)
+
+        # Each exposure is an independent trial, so the chance of escaping all of
+        # them is the product of per-exposure escapes, summed here in log space
+        log_escape = np.zeros(len(pop))
+        hub_risk = (load / (self.hub_capacity + 1)) * self.hub_risk * CONFIG.beta * 0.5 * distancing_factor
+        sus = np.flatnonzero(pop.state == S)
+        hub, w = pop.edge_hub[sus], pop.edge_w[sus]
+        m = (w > 0.1) & (hub >= 0)
+        m[m] = load[hub[m]] > 0
+        prob = np.zeros(w.shape)
+        prob[m] = 1.0 - np.exp(-hub_risk[hub[m]] * w[m] * dt)
+        sus_factor = self.susceptibility(sus)
+        hub_log = np.log1p(-prob * sus_factor[:, None])
+        log_escape[sus] = hub_log.sum(axis=1)
+
+        src, dst = self.contacts.expand(infectors)
+        keep = pop.state[dst] == S
+        src, dst = src[keep], dst[keep]
+        diff = pop.sim_pos[src] - pop.sim_pos[dst]
+        decay = 1.0 / (1.0 + (np.hypot(diff[:, 0], diff[:, 1]) / CONFIG.kappa) ** 2)
+        here = pop.current[src]
+        mult = np.where((here >= 0) & (pop.current[dst] == here), 5.0, 1.0)
+        prob = 1.0 - np.exp(-shedding[src] * CONFIG.beta * distancing_factor * mult * decay * dt)
+        edge_log = np.log1p(-prob * self.susceptibility(dst))
+        log_escape += np.bincount(dst, weights=edge_log, minlength=len(pop))
+
+        hit = np.flatnonzero(self.uniform.take(len(sus)) < -np.expm1(log_escape[sus]))
+        if len(hit) == 0: return
+        shed_src = np.broadcast_to(infectors[:, None], shed_m.shape)[shed_m]
+        parent, setting, at = self.attribute(sus[hit], hub[hit], hub_log[hit], src, dst, edge_log, shed_src, shed_hub[shed_m], shed)
+        self.infect_agents(sus[hit], parent, setting, at)
+
+    def attribute(self, targets, hub, hub_log, src, dst, edge_log, shed_src, shed_hub, shed):
+        # Credit each new infection to one exposure, drawn in proportion to its
+        # hazard (competing risks); a hub exposure then goes to one shedder at
+        # that hub, in proportion to what they put into it. Only the newly
+        # infected rows and the edges into them are looked at
+        k = len(targets)
+        rows, slots = np.nonzero(hub_log < 0)
+        edges = np.flatnonzero(np.isin(dst, targets))
+        owner = np.concatenate([rows, np.searchsorted(targets, dst[edges])])
+        haz = np.concatenate([-hub_log[rows, slots], -edge_log[edges]])
+        pick = weighted_draw(owner, haz, np.arange(k), self.uniform.take(k))
+
+        on_hub = pick < len(rows)
+        parent = np.full(k, -1, dtype=np.int64)
+        at = np.full(k, -1, dtype=np.int64)
+        setting = np.full(k, SOCIAL, dtype=np.int8)
+        parent[~on_hub] = src[edges[pick[~on_hub] - len(rows)]]
+        if on_hub.any():
+            h = hub[rows[pick[on_hub]], slots[pick[on_hub]]]
+            at[on_hub] = h
+            setting[on_hub] = self.hub_type[h]
+            parent[on_hub] = shed_src[weighted_draw(shed_hub, shed, h, self.uniform.take(len(h)))]
+        return parent, setting, at
+
+    def beds_free(self):
+        # Beds are pooled across hospitals
+        return self.hosp_capacity - self.pop.compartments[State.HOSPITALIZED]
+
+    def mortality_bound(self, idx):
+        # Upper bound on each agent's death hazard over its whole infection,
+        # used to draw candidate death times that are thinned at fire time
+        pop = self.pop
+        age = pop.age[idx]
+        frail = (pop.constitution[idx] < 0.4) | (age == AgeGroup.SENIOR.value)
+        bound = CONFIG.base_mortality * np.where(frail, max(1.0, CONFIG.hosp_mortality_mult, CONFIG.no_bed_mult), 1.0)
+        bound = bound * np.where(age == AgeGroup.SENIOR.value, 3.0, 1.0) * np.where(age == AgeGroup.CHILD.value, 0.1, 1.0)
+        return bound
+
+    def mortality_hazard(self, idx):
+        pop = self.pop
+        st = pop.state[idx]
+        age = pop.age[idx]
+        frail = (pop.constitution[idx] < 0.4) | (age == AgeGroup.SENIOR.value)
+        hazard = np.full(len(idx), CONFIG.base_mortality)
+        hazard[pop.vaccinated[idx]] *= 0.1
+        hazard[st == H] *= CONFIG.hosp_mortality_mult
+        if self.beds_free() <= 0:
+            hazard[(st == IS) & frail] *= CONFIG.no_bed_mult
+        hazard[age == AgeGroup.SENIOR.value] *= 3.0
+        hazard[age == AgeGroup.CHILD.value] *= 0.1
+        return hazard
+
+    def schedule_death(self, idx, start):
+        pop = self.pop
+        pop.death_gen[idx] += 1
+        bound = self.mortality_bound(idx)
+        wait = self.rng.exponential(1.0, len(idx)) / np.where(bound > 0, bound, np.nan)
+        self.transitions.push(np.nan_to_num(start + wait, nan=np.inf), idx, DEATH, pop.death_gen[idx])
+
+    def schedule_waning(self, idx):
+        # Immunity is lost once it has decayed to a fifth of its peak
+        pop = self.pop
+        if CONFIG.immunity_waning > 0:
+            self.transitions.push(pop.immune_since[idx] + math.log(1.0 / 0.2) / CONFIG.immunity_waning, idx, WANE, pop.gen[idx])
+
+    def generations(self):
+        # The generation column each transition kind checks, indexed by kind
+        pop = self.pop
+        return [pop.gen, pop.gen, pop.death_gen, pop.gen, pop.gen]
+
+    def update_bio(self, dt):
+        pop = self.pop
+        state = pop.state
+        now = self.sim_time
+
+        # Mortality sliders invalidate the hazard bound of pending death candidates;
+        # exponential waits are memoryless, so redrawing from now is exact
+        key = (CONFIG.base_mortality, CONFIG.hosp_mortality_mult, CONFIG.no_bed_mult)
+        if key != self.mortality_key:
+            self.mortality_key = key
+            ill = np.flatnonzero((state == IS) | (state == IA) | (state == H))
+            if len(ill): self.schedule_death(ill, now)
+            self.transitions.retire(len(ill), self.generations())
+
+        # So does a new waning rate for the pending loss of immunity of the
+        # recovered, which is recomputed from when they recovered
+        if CONFIG.immunity_waning != self.waning_rate:
+            self.waning_rate = CONFIG.immunity_waning
+            rec = np.flatnonzero(state == R)
+            pop.gen[rec] += 1
+            self.schedule_waning(rec)
+            self.transitions.retire(len(rec), self.generations())
+
+        gens = self.generations()
+        while self.transitions.next_time() <= now:
+            due = self.transitions.pop_due(now, gens)
+
+            latent = due.get(ONSET)
+            if latent is not None:
+                age = pop.age[latent]
+                prob_asymp = CONFIG.asymp_prob + 0.4 * pop.vaccinated[latent] + 0.2 * (age == AgeGroup.CHILD.value) - 0.2 * (age == AgeGroup.SENIOR.value)
+                asymp = self.uniform.take(len(latent)) < prob_asymp
+                pop.set_state(latent, np.where(asymp, IA, IS))
+                pop.peak_shedding[latent] = np.where(asymp, CONFIG.shedding_asymp, CONFIG.shedding_symp) * np.where(pop.superspreader[latent], 3.0, 1.0)
+                symp = latent[~asymp]
+                quar = symp[~pop.in_quarantine[symp] & (self.uniform.take(len(symp)) < CONFIG.quarantine_rate)]
+                pop.in_quarantine[quar] = True
+                pop.set_targets(quar, pop.edge_hub[quar, SLOT_QUAR])
+                pop.state_since[latent] = now
+                self.transitions.push(now + pop.inf_dur[latent], latent, RECOVER, pop.gen[latent])
+                frail = (pop.constitution[symp] < 0.4) | (pop.age[symp] == AgeGroup.SENIOR.value)
+                self.transitions.push(np.full(frail.sum(), now + 2.0), symp[frail], ADMIT, pop.gen[symp[frail]])
+                self.schedule_death(latent, now)
+
+            admit = due.get(ADMIT)
+            if admit is not None:
+                for a in admit[state[admit] == IS].tolist(): self.awaiting_bed[a] = pop.gen[a]
+
+            dying = due.get(DEATH)
+            if dying is not None:
+                dying = dying[(state[dying] == IS) | (state[dying] == IA) | (state[dying] == H)]
+                accept = self.uniform.take(len(dying)) * self.mortality_bound(dying) < self.mortality_hazard(dying)
+                dead = dying[accept]
+                pop.set_state(dead, D)
+                pop.gen[dead] += 1
+                pop.in_quarantine[dead] = False
+                pop.set_targets(dead, self.cemetery.idx)
+                retry = dying[~accept]
+                self.schedule_death(retry, now)
+
+            # Earlier kinds in the batch may have moved an agent on (a death
+            # due alongside the recovery), so only the still ill recover
+            rec = due.get(RECOVER)
+            if rec is not None:
+                rec = rec[(state[rec] == IS) | (state[rec] == IA) | (state[rec] == H)]
+                pop.set_state(rec, R)
+                pop.gen[rec] += 1
+                pop.immunity[rec] = 1.0
+                pop.immune_since[rec] = now
+                pop.in_quarantine[rec] = False
+                self.schedule_waning(rec)
+                cur = pop.current[rec]
+                rec = rec[(cur == pop.edge_hub[rec, SLOT_HOSP]) | (cur == pop.edge_hub[rec, SLOT_QUAR])]
+                pop.set_targets(rec, pop.home[rec])
+
+            lost = due.get(WANE)
+            if lost is not None:
+                lost = lost[state[lost] == R]
+                pop.set_state(lost, S)
+                pop.gen[lost] += 1
+                pop.immunity[lost] = 0.0
+
+        if self.awaiting_bed:
+            beds_free = self.beds_free()
+            if beds_free > 0:
+                waiting = np.array([a for a, g in self.awaiting_bed.items() if pop.gen[a] == g and state[a] == IS], dtype=np.int64)
+                admit = waiting
+                if len(admit) > beds_free: admit = self.rng.choice(admit, beds_free, replace=False)
+                pop.set_state(admit, H)
+                pop.in_quarantine[admit] = False
+                pop.set_targets(admit, pop.edge_hub[admit, SLOT_HOSP])
+                pop.hospital_stay_dur[admit] = np.maximum(2.0, self.rng.normal(CONFIG.hosp_stay_mean, 2.0, len(admit)))
+                self.awaiting_bed = {a: pop.gen[a] for a in np.setdiff1d(waiting, admit).tolist()}
 
     def apply_schedule(self):
-        is_weekend = (self.day % 7) >= 5
+        # Targets for the whole population from the compiled itinerary tables
+        # (schedule.py); set_targets only touches agents whose hub changes
         social = CONFIG.social_engagement
-        is_lockdown = social < 0.4
-        
-        for p in self.agents:
-            if p.state == State.DEAD: 
-                p.set_target(self.cemetery)
-                continue
-            if p.state == State.HOSPITALIZED:
-                p.set_target(self.hosp) 
-                continue
-            if p.in_quarantine:
-                p.set_target(self.quar)
-                continue
-            if p.state == State.INF_SYMP:
-                p.set_target(p.home)
-                continue
-
-            if self.tick == 0: 
-                if is_weekend:
-                    if random.random() < (0.5 * social):
-                        r = random.random()
-                        if r < 0.4: p.set_target(self.park)
-                        elif r < 0.7: p.set_target(self.market)
-                        else: p.set_target(self.cafe)
-                    else:
-                        p.set_target(p.home)
-                else:
-                    if is_lockdown:
-                        if random.random() < 0.02: p.set_target(self.market)
-                        else: p.set_target(p.home)
-                    else:
-                        if p.age == AgeGroup.SENIOR or p.mobility == MobilityType.LOW:
-                            if random.random() < 0.15: p.set_target(self.market)
-                            else: p.set_target(p.home)
-                        elif p.assigned_hub:
-                            if random.random() < 0.95: p.set_target(p.assigned_hub)
-                            else: p.set_target(p.home)
-                        else:
-                            p.set_target(p.home)
-            elif self.tick == 1:
-                if is_lockdown:
-                    p.set_target(p.home)
-                else:
-                    if p.mobility == MobilityType.HIGH and random.random() < (0.3 * social): p.set_target(self.cafe)
-                    elif random.random() < (0.2 * social): p.set_target(random.choice(self.households)) 
-                    elif random.random() < (0.2 * social): p.set_target(self.market)
-                    else: p.set_target(p.home)
-            elif self.tick == 2:
-                p.set_target(p.home)
\ No newline at end of file
+        pop = self.pop
+        targets = self.schedule.targets(pop, day_kind(self.day, social), self.tick, social, self.rng)
+        pop.set_targets(np.arange(len(pop)), targets)
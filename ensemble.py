@@ -0,0 +1,104 @@
+import os
+import multiprocessing as mp
+import numpy as np
+from config import CONFIG
+from engine import Engine
+
+SERIES = ('S', 'Active', 'H', 'R', 'D')
+QUANTILES = (0.05, 0.5, 0.95)
+
+def replicate_seeds(seed, replicates):
+    # One independent stream per replicate index, so a replicate's result does
+    # not depend on which worker runs it or how many workers there are
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(replicates)]
+
+def daily_series(engine, days):
+    # One compartment snapshot per simulated day from the engine's current
+    # day onwards, that day included
+    start = engine.day
+    out = np.zeros((days + 1, len(SERIES)), dtype=np.int32)
+    snap = engine.pop.compartments.snapshot()
+    out[0] = [snap[k] for k in SERIES]
+    while engine.day < start + days:
+        day = engine.day
+        engine.update()
+        if engine.day != day:
+            snap = engine.pop.compartments.snapshot()
+            out[engine.day - start] = [snap[k] for k in SERIES]
+    return out
+
+def run_replicate(job):
+    index, params, seed, days, world_seed = job
+    saved = dict(vars(CONFIG))
+    CONFIG.__dict__.update(vars(params))
+    try:
+        return index, daily_series(Engine(headless=True, seed=seed, world_seed=world_seed), days)
+    finally:
+        CONFIG.__dict__.update(saved)
+
+def run_fork(job):
+    # Continue a checkpoint under its own seed, with optional Params overrides
+    # applied on top of the parameters saved in the checkpoint
+    index, path, overrides, seed, days = job
+    saved = dict(vars(CONFIG))
+    try:
+        engine = Engine(headless=True, checkpoint=path)
+        CONFIG.__dict__.update(overrides)
+        engine.reseed(seed)
+        return index, daily_series(engine, days)
+    finally:
+        CONFIG.__dict__.update(saved)
+
+class EnsembleResult:
+    def __init__(self, series, seeds):
+        self.series = series    # (replicates, days + 1, len(SERIES))
+        self.seeds = seeds
+        self.mean = series.mean(axis=0)
+        q = np.quantile(series, QUANTILES, axis=0)
+        self.q05, self.median, self.q95 = q[0], q[1], q[2]
+
+    def band(self, key):
+        k = SERIES.index(key)
+        return {'mean': self.mean[:, k], 'median': self.median[:, k], 'q05': self.q05[:, k], 'q95': self.q95[:, k]}
+
+    def to_csv(self, path):
+        header = ['day'] + [f"{key}_{stat}" for key in SERIES for stat in ('mean', 'median', 'q05', 'q95')]
+        with open(path, 'w') as f:
+            f.write(','.join(header) + '\n')
+            for day in range(self.mean.shape[0]):
+                row = [str(day)]
+                for k in range(len(SERIES)):
+                    row += [f"{self.mean[day, k]:.3f}", f"{self.median[day, k]:.1f}", f"{self.q05[day, k]:.1f}", f"{self.q95[day, k]:.1f}"]
+                f.write(','.join(row) + '\n')
+
+def run_jobs(fn, jobs, series, workers, on_result):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = map(fn, jobs)
+        for index, s in results:
+            series[index] = s
+            if on_result: on_result(index, s)
+    else:
+        with mp.Pool(workers) as pool:
+            for index, s in pool.imap_unordered(fn, jobs):
+                series[index] = s
+                if on_result: on_result(index, s)
+
+def run_ensemble(params=None, replicates=200, days=180, seed=0, workers=None, on_result=None, world_seed=None):
+    # With a world_seed every replicate runs on the same cached world and only
+    # the outbreak varies; without one each replicate draws its own world
+    params = params or CONFIG
+    seeds = replicate_seeds(seed, replicates)
+    jobs = [(i, params, s, days, world_seed) for i, s in enumerate(seeds)]
+    series = np.zeros((replicates, days + 1, len(SERIES)), dtype=np.int32)
+    run_jobs(run_replicate, jobs, series, workers, on_result)
+    return EnsembleResult(series, seeds)
+
+def fork_ensemble(path, replicates=100, days=60, seed=0, overrides=None, workers=None, on_result=None):
+    # N seeded continuations of one checkpoint; day 0 of each series is the
+    # checkpoint's day. Workers map the checkpoint rather than re-simulating the prefix
+    seeds = replicate_seeds(seed, replicates)
+    jobs = [(i, path, dict(overrides or {}), s, days) for i, s in enumerate(seeds)]
+    series = np.zeros((replicates, days + 1, len(SERIES)), dtype=np.int32)
+    run_jobs(run_fork, jobs, series, workers, on_result)
+    return EnsembleResult(series, seeds)
@@ -1,20 +1,20 @@
-import pygame
-import random
-from config import COLORS, CONFIG, DAMPING
-from enums import LocationType, State, AgeGroup
+from config import CONFIG
+from enums import LocationType, State, AgeGroup, MobilityType
+from vector import Vector2
 
 class Hub:
     def __init__(self, uid, x, y, r, l_type, label, capacity, risk_mult):
         self.id = uid
-        self.sim_pos = pygame.math.Vector2(x, y) 
-        self.graph_pos = pygame.math.Vector2(x, y)
+        self.sim_pos = Vector2(x, y) 
+        self.graph_pos = Vector2(x, y)
         self.radius = r
         self.type = l_type
         self.label = label
         self.capacity = capacity
         self.risk_mult = risk_mult
-        self.agents_present = [] 
-        self.temp_viral_load = 0.0 
+        self.idx = -1
+        self.loads = None    # engine's per-hub viral load array, indexed by idx
+        self.label_surf = None
         
         self.base_color = (35, 40, 50)
         if l_type == LocationType.HOSPITAL: self.base_color = (60, 20, 40)
@@ -24,76 +24,147 @@ class Hub:
         elif l_type == LocationType.MARKET: self.base_color = (40, 50, 60)
         elif l_type == LocationType.QUARANTINE: self.base_color = (60, 60, 20)
 
+    @property
+    def temp_viral_load(self):
+        return float(self.loads[self.idx]) if self.loads is not None else 0.0
+
     def draw(self, surface, mode="SIM"):
         if mode == "GRAPH" and self.type == LocationType.HOUSEHOLD: return
+        self.draw_base(surface, mode)
+        self.draw_load(surface, mode)
 
-        draw_pos = self.sim_pos if mode == "SIM" else self.graph_pos
-        color = list(self.base_color)
-        r = self.radius if mode == "SIM" else self.radius * 0.6 
-        
-        pygame.draw.circle(surface, color, (int(draw_pos.x), int(draw_pos.y)), int(r))
-        
-        border_col = (60, 70, 80)
-        if self.type == LocationType.QUARANTINE: border_col = (150, 150, 50)
-        
-        if self.temp_viral_load > 0.1:
-            val = min(255, int(self.temp_viral_load * 50))
-            border_col = (val, 50, 50)
-            
-        pygame.draw.circle(surface, border_col, (int(draw_pos.x), int(draw_pos.y)), int(r), 2)
-        
+    def placement(self, mode):
+        pos = self.sim_pos if mode == "SIM" else self.graph_pos
+        return (int(pos.x), int(pos.y)), int(self.radius if mode == "SIM" else self.radius * 0.6)
+
+    def draw_base(self, surface, mode="SIM"):
+        # Everything but the viral-load border, which is all that changes frame to frame
+        import pygame
+        center, r = self.placement(mode)
+        pygame.draw.circle(surface, self.base_color, center, r)
+        border_col = (150, 150, 50) if self.type == LocationType.QUARANTINE else (60, 70, 80)
+        pygame.draw.circle(surface, border_col, center, r, 2)
         if self.type != LocationType.HOUSEHOLD:
-            font = pygame.font.SysFont("Arial", 10, bold=True)
-            txt = font.render(self.label, True, (220, 220, 220))
-            text_rect = txt.get_rect(center=(int(draw_pos.x), int(draw_pos.y)))
-            surface.blit(txt, text_rect)
+            txt = self.label_surface()
+            surface.blit(txt, txt.get_rect(center=center))
+
+    def draw_load(self, surface, mode="SIM"):
+        import pygame
+        load = self.temp_viral_load
+        if load > 0.1:
+            center, r = self.placement(mode)
+            pygame.draw.circle(surface, (min(255, int(load * 50)), 50, 50), center, r, 2)
+
+    def label_surface(self):
+        if self.label_surf is None:
+            self.label_surf = font("Arial", 10, bold=True).render(self.label, True, (220, 220, 220))
+        return self.label_surf
+
+_fonts = {}
+
+def font(name, size, bold=False):
+    # SysFont scans the system font list, so each face is only ever loaded once
+    key = (name, size, bold)
+    if key not in _fonts:
+        import pygame
+        _fonts[key] = pygame.font.SysFont(name, size, bold=bold)
+    return _fonts[key]
+
+STATES = tuple(State)
+AGES = tuple(AgeGroup)
+MOBILITIES = tuple(MobilityType)
+
+def _column(name, cast=None):
+    def get(self):
+        v = getattr(self.pop, name)[self.id]
+        return cast(v) if cast else v
+    def set(self, v):
+        getattr(self.pop, name)[self.id] = v
+    return property(get, set)
+
+def _enum_column(name, members):
+    def get(self): return members[getattr(self.pop, name)[self.id]]
+    def set(self, v): getattr(self.pop, name)[self.id] = v.value
+    return property(get, set)
+
+def _hub_column(name):
+    def get(self):
+        h = getattr(self.pop, name)[self.id]
+        return self.pop.hubs[h] if h >= 0 else None
+    def set(self, hub): getattr(self.pop, name)[self.id] = hub.idx if hub else -1
+    return property(get, set)
+
+def _vec_column(name):
+    def get(self): return Vector2(*getattr(self.pop, name)[self.id])
+    def set(self, v): getattr(self.pop, name)[self.id] = (v[0], v[1])
+    return property(get, set)
 
 class Person:
-    def __init__(self, uid, home, age, mob):
+    # Thin view over one row of a population.Population
+    __slots__ = ('pop', 'id')
+
+    def __init__(self, pop, uid):
+        self.pop = pop
         self.id = uid
-        self.home = home
-        self.age = age
-        self.mobility = mob
-        self.state = State.SUSCEPTIBLE
-        self.vaccinated = False
-        self.in_quarantine = False
-        
-        self.days_in_state = 0.0
-        base_const = {AgeGroup.CHILD: 0.8, AgeGroup.ADULT: 0.6, AgeGroup.SENIOR: 0.3}
-        self.constitution = min(1.0, max(0.1, base_const[age] + random.uniform(-0.15, 0.15)))
-        self.immunity = 0.0
-        
-        self.latent_dur = 0
-        self.inf_dur = 0
-        self.peak_shedding = 0
-        self.is_superspreader = (random.random() < CONFIG.superspreader_prob)
-        self.hospital_stay_dur = 0
-        self.masked = (random.random() < CONFIG.mask_compliance)
-        
-        self.assigned_hub = None
-        self.target = home
-        self.current_hub = home 
-        self.sim_pos = self._get_random_point(home)
-        self.target_pos = self.sim_pos 
-        
-        # Graph Physics
-        self.graph_pos = pygame.math.Vector2(home.graph_pos.x, home.graph_pos.y)
-        self.vel = pygame.math.Vector2(0,0)
-        self.acc = pygame.math.Vector2(0,0)
-        
-        self.graph_neighbors = []      
-        self.structural_edges = {} 
-        self.permanent_affiliations = []
 
-    def _get_random_point(self, hub):
-        offset = pygame.math.Vector2(random.uniform(-1,1), random.uniform(-1,1))
-        if offset.length() > 0: offset.normalize_ip()
-        return hub.sim_pos + offset * random.uniform(0, hub.radius - 2)
+    def __eq__(self, other):
+        return isinstance(other, Person) and other.pop is self.pop and other.id == self.id
+
+    def __hash__(self): return hash((id(self.pop), self.id))
+
+    @property
+    def state(self): return STATES[self.pop.state[self.id]]
+
+    @state.setter
+    def state(self, v): self.pop.set_state([self.id], v.value)
+
+    @property
+    def vaccinated(self): return bool(self.pop.vaccinated[self.id])
+
+    @vaccinated.setter
+    def vaccinated(self, v): self.pop.set_vaccinated([self.id], v)
+
+    age = _enum_column('age', AGES)
+    mobility = _enum_column('mobility', MOBILITIES)
+    in_quarantine = _column('in_quarantine', bool)
+    masked = _column('masked', bool)
+    is_superspreader = _column('superspreader', bool)
+    latent_dur = _column('latent_dur', float)
+    inf_dur = _column('inf_dur', float)
+    hospital_stay_dur = _column('hospital_stay_dur', float)
+    peak_shedding = _column('peak_shedding', float)
+    constitution = _column('constitution', float)
+
+    home = _hub_column('home')
+    assigned_hub = _hub_column('assigned')
+    target = _hub_column('target')
+    current_hub = _hub_column('current')
+
+    sim_pos = _vec_column('sim_pos')
+    target_pos = _vec_column('target_pos')
+    graph_pos = _vec_column('graph_pos')
+
+    @property
+    def days_in_state(self): return float(self.pop.days_in_state(self.id))
+
+    @property
+    def immunity(self): return float(self.pop.current_immunity(self.id))
+
+    @property
+    def graph_neighbors(self):
+        return [Person(self.pop, j) for j in self.pop.contacts.neighbors(self.id).tolist()]
+
+    @property
+    def structural_edges(self):
+        hubs = self.pop.hubs
+        return {hubs[h]: float(w) for h, w in zip(self.pop.edge_hub[self.id], self.pop.edge_w[self.id]) if h >= 0}
+
+    @property
+    def permanent_affiliations(self):
+        return [self.home] + ([self.assigned_hub] if self.pop.assigned[self.id] >= 0 else [])
 
     def set_target(self, hub):
-        if self.target == hub: return
-        self.target = hub
-        self.target_pos = self._get_random_point(hub)
+        self.pop.set_targets([self.id], hub.idx)
 
     def get_shedding(self):
         if self.state not in [State.INF_ASYMP, State.INF_SYMP, State.HOSPITALIZED]: return 0.0
@@ -103,63 +174,3 @@ class Person:
         amt = val * self.peak_shedding
         if self.masked: amt *= (1.0 - CONFIG.mask_efficacy)
         return amt
-
-    def move_spatial(self, dt):
-        if self.state == State.DEAD:
-            if self.current_hub and self.current_hub.type == LocationType.CEMETERY: return
-        
-        dest = self.target_pos
-        dist = self.sim_pos.distance_to(dest)
-        speed = 500.0 * (1.0 if self.state != State.DEAD else 0.2)
-        step_dist = speed * dt * 5.0
-        
-        if dist <= step_dist:
-            self.sim_pos = dest
-            self.current_hub = self.target 
-            if self.state != State.DEAD and random.random() < 0.05:
-                self.sim_pos += pygame.math.Vector2(random.uniform(-0.5,0.5), random.uniform(-0.5,0.5))
-        else:
-            self.current_hub = None
-            direction = dest - self.sim_pos
-            if direction.length() > 0: direction.normalize_ip()
-            self.sim_pos += direction * step_dist
-
-        self.update_edge_weights(dt)
-
-    def update_edge_weights(self, dt):
-        fade_speed = 5.0 * dt 
-        for hub, weight in self.structural_edges.items():
-            target_w = 1.0 if self.current_hub == hub else 0.0
-            
-            if weight < target_w:
-                weight = min(target_w, weight + fade_speed)
-            elif weight > target_w:
-                weight = max(target_w, weight - fade_speed)
-            self.structural_edges[hub] = weight
-
-    def update_physics(self):
-        self.vel += self.acc
-        self.vel *= DAMPING
-        if self.vel.length() > 8: self.vel.scale_to_length(8) 
-        self.graph_pos += self.vel
-        self.acc *= 0
-
-    def draw(self, surface, mode):
-        key = 'S'
-        if self.state == State.LATENT: key = 'L'
-        elif self.state == State.INF_ASYMP: key = 'IA'
-        elif self.state == State.INF_SYMP: key = 'IS'
-        elif self.state == State.HOSPITALIZED: key = 'H'
-        elif self.state == State.RECOVERED: key = 'R'
-        elif self.state == State.DEAD: key = 'D'
-        
-        color = COLORS[key]
-        if self.state == State.SUSCEPTIBLE and self.vaccinated:
-            color = COLORS['V']
-
-        pos = self.sim_pos if mode == "SIM" else self.graph_pos
-        radius = 3 if mode == "SIM" else 4
-        
-        pygame.draw.circle(surface, color, (int(pos.x), int(pos.y)), radius)
-        if mode == "GRAPH":
-            pygame.draw.circle(surface, (20,20,20), (int(pos.x), int(pos.y)), radius, 1)
\ No newline at end of file
@@ -0,0 +1,211 @@
+import json
+import mmap
+import struct
+import zlib
+import numpy as np
+from config import EVENTLOG_CHUNK, REPLAY_KEYFRAME_DAYS, REPLAY_KEYFRAME_BUDGET, WALK_SPEED, DEAD_SPEED
+from enums import State
+
+# Binary log of every state, vaccination and target change, for replaying a run
+# without the engine. Layout: MAGIC, uint64 header length, JSON header (world
+# and hubs), a zlib snapshot of the agents when recording started, then chunks
+# of events. Each chunk is a fixed CHUNK struct followed by a zlib payload of
+# column arrays. Agent ids are delta-encoded across the chunk, so the sorted
+# runs Population writes compress to almost nothing. The size grows with the
+# number of events, not with agents x frames.
+
+MAGIC = b'EPILOG01'
+STATE, VACCINATED, TARGET = range(3)
+CHUNK = struct.Struct('<IIIIdd')    # payload bytes, groups, events, target events, first and last time
+
+def snapshot_layout(n):
+    return [('state', np.int8, (n,)), ('vaccinated', np.bool_, (n,)), ('target', np.int32, (n,)),
+            ('sim_pos', np.float32, (n, 2)), ('target_pos', np.float32, (n, 2))]
+
+class EventRecorder:
+    # Population calls states / vaccinations / targets on every write; events
+    # are stamped with the engine clock and flushed a chunk at a time
+    def __init__(self, path, engine, chunk=EVENTLOG_CHUNK):
+        self.engine = engine
+        self.chunk = chunk
+        self.groups = []
+        self.pending = 0
+        self.events = 0
+        pop = engine.pop
+        header = {'n': len(pop), 'time': engine.sim_time, 'day': engine.day, 'tick': engine.tick, 'hosp_capacity': engine.hosp_capacity,
+                  'hubs': [[h.sim_pos.x, h.sim_pos.y, h.radius, h.type.value, h.label, h.capacity, h.risk_mult] for h in engine.hubs]}
+        blob = json.dumps(header).encode()
+        snap = zlib.compress(b''.join(np.ascontiguousarray(getattr(pop, name), dtype=dt).tobytes() for name, dt, _ in snapshot_layout(len(pop))))
+        self.f = open(path, 'wb')
+        self.f.write(MAGIC)
+        self.f.write(np.uint64(len(blob)).tobytes())
+        self.f.write(blob)
+        self.f.write(np.uint64(len(snap)).tobytes())
+        self.f.write(snap)
+
+    def add(self, kind, idx, value, pos=None):
+        idx = np.asarray(idx)
+        self.groups.append((self.engine.sim_time, kind, idx.astype(np.int32),
+                            np.broadcast_to(np.asarray(value, dtype=np.int32), idx.shape).copy(), pos))
+        self.pending += len(idx)
+        if self.pending >= self.chunk: self.flush()
+
+    def states(self, idx, value): self.add(STATE, idx, value)
+
+    def vaccinations(self, idx, flag): self.add(VACCINATED, idx, int(flag))
+
+    def targets(self, idx, hub_idx, pos): self.add(TARGET, idx, hub_idx, np.asarray(pos, dtype=np.int16))
+
+    def flush(self):
+        if not self.groups: return
+        times = np.array([g[0] for g in self.groups], dtype=np.float64)
+        kinds = np.array([g[1] for g in self.groups], dtype=np.uint8)
+        counts = np.array([len(g[2]) for g in self.groups], dtype=np.uint32)
+        agents = np.concatenate([g[2] for g in self.groups])
+        values = np.concatenate([g[3] for g in self.groups])
+        pos = [g[4] for g in self.groups if g[1] == TARGET]
+        pos = np.concatenate(pos) if pos else np.zeros((0, 2), dtype=np.int16)
+        delta = np.diff(agents, prepend=np.int32(0)).astype(np.int32)
+        payload = zlib.compress(b''.join(a.tobytes() for a in (times, kinds, counts, delta, values, pos)))
+        self.f.write(CHUNK.pack(len(payload), len(times), len(agents), len(pos), times[0], times[-1]))
+        self.f.write(payload)
+        self.events += len(agents)
+        self.groups, self.pending = [], 0
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+class EventLog:
+    # Read side: the header and snapshot up front, chunks decoded on demand
+    def __init__(self, path):
+        with open(path, 'rb') as f: data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(MAGIC)] != MAGIC: raise ValueError(f"{path} is not an event log")
+        pos = len(MAGIC)
+        size = int(np.frombuffer(data, np.uint64, 1, pos)[0])
+        self.header = json.loads(data[pos + 8:pos + 8 + size])
+        pos += 8 + size
+        size = int(np.frombuffer(data, np.uint64, 1, pos)[0])
+        raw = zlib.decompress(data[pos + 8:pos + 8 + size])
+        pos += 8 + size
+        self.n = n = self.header['n']
+        self.snapshot, off = {}, 0
+        for name, dt, shape in snapshot_layout(n):
+            a = np.frombuffer(raw, dt, int(np.prod(shape)), off).reshape(shape)
+            self.snapshot[name] = a
+            off += a.nbytes
+        # (offset, groups, events, target events, t0, t1); a chunk cut short by
+        # a crashed run is ignored
+        self.data = data
+        self.chunks = []
+        while pos + CHUNK.size <= len(data):
+            nbytes, g, e, tg, t0, t1 = CHUNK.unpack_from(data, pos)
+            if pos + CHUNK.size + nbytes > len(data): break
+            self.chunks.append((pos + CHUNK.size, nbytes, g, e, tg, t0, t1))
+            pos += CHUNK.size + nbytes
+        self.start = self.header['time']
+        self.end = self.chunks[-1][6] if self.chunks else self.start
+        self.cache = (None, None)
+
+    def events(self):
+        return sum(c[3] for c in self.chunks)
+
+    def chunk(self, i):
+        if self.cache[0] == i: return self.cache[1]
+        off, nbytes, g, e, tg = self.chunks[i][:5]
+        raw = zlib.decompress(self.data[off:off + nbytes])
+        cols, at = [], 0
+        for dt, count in ((np.float64, g), (np.uint8, g), (np.uint32, g), (np.int32, e), (np.int32, e), (np.int16, tg * 2)):
+            cols.append(np.frombuffer(raw, dt, count, at))
+            at += cols[-1].nbytes
+        times, kinds, counts, delta, values, pos = cols
+        starts = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        pos_starts = np.concatenate([[0], np.cumsum(np.where(kinds == TARGET, counts, 0), dtype=np.int64)])
+        out = (times, kinds, starts, np.cumsum(delta, dtype=np.int64), values, pos.reshape(-1, 2).astype(np.float32), pos_starts)
+        self.cache = (i, out)
+        return out
+
+class Replay:
+    # Agent state at any time in the log. Playing forward applies events as
+    # they come; seeking back restores the nearest keyframe (taken every
+    # REPLAY_KEYFRAME_DAYS while the log is scanned on open) and plays forward.
+    # Keyframes are kept compressed, and whenever they outgrow `budget` bytes
+    # every other one is dropped and the spacing doubles, so memory stays
+    # bounded on long logs at the price of longer seeks
+    FIELDS = ('state', 'vaccinated', 'target', 'from_pos', 'to_pos', 'moved_at')
+
+    def __init__(self, log, keyframe_days=REPLAY_KEYFRAME_DAYS, budget=REPLAY_KEYFRAME_BUDGET):
+        self.log = log
+        snap = log.snapshot
+        self.state = snap['state'].copy()
+        self.vaccinated = snap['vaccinated'].copy()
+        self.target = snap['target'].copy()
+        self.from_pos = snap['sim_pos'].copy()
+        self.to_pos = snap['target_pos'].copy()
+        self.moved_at = np.full(log.n, log.start)
+        self.time = log.start
+        self.cursor = (0, 0)    # next (chunk, group) to apply
+        self.spacing = keyframe_days
+        self.keyframes = [self.keyframe()]
+        while self.time < log.end:
+            self.play(min(self.time + self.spacing, log.end))
+            self.keyframes.append(self.keyframe())
+            while len(self.keyframes) > 2 and self.keyframe_bytes() > budget:
+                self.keyframes = self.keyframes[::2]
+                self.spacing *= 2
+        self.seek(log.start)
+
+    def keyframe(self):
+        return (self.time, self.cursor, zlib.compress(b''.join(getattr(self, k).tobytes() for k in self.FIELDS), 1))
+
+    def keyframe_bytes(self):
+        return sum(len(k[2]) for k in self.keyframes)
+
+    def restore(self, frame):
+        self.time, self.cursor, blob = frame
+        raw, off = zlib.decompress(blob), 0
+        for k in self.FIELDS:
+            a = getattr(self, k)
+            a[:] = np.frombuffer(raw, a.dtype, a.size, off).reshape(a.shape)
+            off += a.nbytes
+
+    def play(self, t):
+        # Apply every event up to and including time t
+        log = self.log
+        ci, gi = self.cursor
+        while ci < len(log.chunks):
+            times, kinds, starts, agents, values, pos, pos_starts = log.chunk(ci)
+            while gi < len(times) and times[gi] <= t:
+                a = agents[starts[gi]:starts[gi + 1]]
+                v = values[starts[gi]:starts[gi + 1]]
+                if kinds[gi] == STATE: self.state[a] = v
+                elif kinds[gi] == VACCINATED: self.vaccinated[a] = v.astype(bool)
+                else:
+                    self.from_pos[a] = self.positions(times[gi], a)
+                    self.to_pos[a] = pos[pos_starts[gi]:pos_starts[gi + 1]]
+                    self.moved_at[a] = times[gi]
+                    self.target[a] = v
+                gi += 1
+            if gi < len(times): break
+            ci, gi = ci + 1, 0
+        self.cursor = (ci, gi)
+        self.time = t
+
+    def seek(self, t):
+        t = min(max(t, self.log.start), self.log.end)
+        if t < self.time:
+            self.restore(max((k for k in self.keyframes if k[0] <= t), key=lambda k: k[0]))
+        self.play(t)
+
+    def positions(self, t=None, idx=slice(None)):
+        # Agents travel in a straight line at the engine's speed towards the
+        # point they were sent to
+        t = self.time if t is None else t
+        diff = self.to_pos[idx] - self.from_pos[idx]
+        dist = np.hypot(diff[:, 0], diff[:, 1])
+        speed = np.where(self.state[idx] == State.DEAD.value, WALK_SPEED * DEAD_SPEED, WALK_SPEED)
+        frac = np.clip(np.divide(speed * (t - self.moved_at[idx]), dist, out=np.ones_like(dist), where=dist > 0), 0.0, 1.0)
+        return self.from_pos[idx] + diff * frac[:, None].astype(np.float32)
+
+    def counts(self):
+        return np.bincount(self.state, minlength=len(State))
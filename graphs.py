@@ -0,0 +1,135 @@
+import numpy as np
+from contacts import ContactGraph
+
+# Contact-graph generators that build the edge list with whole-array numpy
+# operations and hand it straight to ContactGraph's CSR. networkx is only
+# imported by compare_networkx, to check that the statistics line up.
+
+MODELS = ('small_world', 'erdos_renyi', 'household')
+HOUSEHOLD_REACH = 3     # housemates linked on each side; households up to 7 are cliques
+
+def edge_keys(u, v, n):
+    return np.minimum(u, v).astype(np.int64) * n + np.maximum(u, v)
+
+def unique(keys):
+    # Sorted distinct values; a plain sort beats np.unique's hashing on int64 keys
+    keys = np.sort(keys)
+    return keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+
+def dedupe(u, v, n):
+    keep = u != v
+    keys = unique(edge_keys(u[keep], v[keep], n))
+    return np.stack([keys // n, keys % n], axis=1).astype(np.int32)
+
+def complete(n):
+    u, v = np.triu_indices(n, 1)
+    return np.stack([u, v], axis=1).astype(np.int32)
+
+def watts_strogatz(n, k, p, rng):
+    # Ring lattice with k // 2 neighbours on each side; each lattice edge (u, v)
+    # is rewired to (u, w) with probability p, w uniform, redrawing self-loops
+    # and duplicates as networkx does. The edge count is kept exactly
+    half = int(k) // 2
+    if half == 0 or n < 2: return np.zeros((0, 2), dtype=np.int32)
+    if int(k) >= n: return complete(n)
+    u = np.tile(np.arange(n, dtype=np.int64), half)
+    v = (u + np.repeat(np.arange(1, half + 1), n)) % n
+    redo = np.flatnonzero(rng.random(len(u)) < p)
+    for _ in range(64):
+        if len(redo) == 0: break
+        v[redo] = rng.integers(n, size=len(redo))
+        fresh = np.zeros(len(u), dtype=bool)
+        fresh[redo] = True
+        # Settled edges sort ahead of fresh ones with the same key, so a fresh
+        # edge is only ever the one that has to move
+        keys = edge_keys(u, v, n)
+        order = np.lexsort((fresh, keys))
+        dup = order[1:][keys[order][1:] == keys[order][:-1]]
+        clash = np.zeros(len(u), dtype=bool)
+        clash[dup] = True
+        clash[redo[u[redo] == v[redo]]] = True
+        redo = np.flatnonzero(clash & fresh)
+    return dedupe(u, v, n)
+
+def erdos_renyi(n, p, rng):
+    # G(n, p): the edge count is Binomial(n(n-1)/2, p), then that many distinct
+    # pairs are taken uniformly by drawing pairs in bulk and dropping repeats
+    total = n * (n - 1) // 2
+    m = int(rng.binomial(total, p)) if total else 0
+    if m == 0: return np.zeros((0, 2), dtype=np.int32)
+    if m > total // 2:
+        keys = np.flatnonzero(rng.random(total) < p)
+        u, v = np.triu_indices(n, 1)
+        return np.stack([u[keys], v[keys]], axis=1).astype(np.int32)
+    keys = np.zeros(0, dtype=np.int64)
+    while len(keys) < m:
+        a = rng.integers(n, size=int((m - len(keys)) * 1.2) + 16)
+        b = rng.integers(n, size=len(a))
+        keep = a != b
+        keys = unique(np.concatenate([keys, edge_keys(a[keep], b[keep], n)]))
+    keys = rng.choice(keys, m, replace=False)
+    return np.stack([keys // n, keys % n], axis=1).astype(np.int32)
+
+def household_edges(home, reach=HOUSEHOLD_REACH):
+    # Each household is a ring of its members linked `reach` steps each way,
+    # which makes every household of up to 2 * reach + 1 people a clique
+    n = len(home)
+    order = np.argsort(home, kind='stable')
+    sorted_home = home[order]
+    sizes = np.bincount(home)[sorted_home]
+    start = np.searchsorted(sorted_home, sorted_home)
+    pos = np.arange(n) - start
+    us, vs = [], []
+    for r in range(1, reach + 1):
+        m = sizes > r
+        us.append(order[m])
+        vs.append(order[start[m] + (pos[m] + r) % sizes[m]])
+    return np.concatenate(us), np.concatenate(vs)
+
+def household_clustered(home, k, p, rng):
+    # Household cliques on top of a small-world graph over the whole population
+    n = len(home)
+    ws = watts_strogatz(n, k, p, rng)
+    hu, hv = household_edges(np.asarray(home))
+    return dedupe(np.concatenate([ws[:, 0], hu]), np.concatenate([ws[:, 1], hv]), n)
+
+def generate(model, n, k, p, rng, home=None):
+    # k is the mean degree for every model; p is the small-world rewiring probability
+    if model == 'household': edges = household_clustered(home, k, p, rng)
+    elif model == 'erdos_renyi': edges = erdos_renyi(n, min(1.0, k / max(1, n - 1)), rng)
+    elif model == 'small_world':
+        # networkx refuses k > n; the engine has always fallen back to a sparse random graph then
+        edges = erdos_renyi(n, 0.05, rng) if int(k) > n else watts_strogatz(n, k, p, rng)
+    else: raise ValueError(f"unknown graph model '{model}', expected one of {MODELS}")
+    return ContactGraph.from_edges(n, edges)
+
+def clustering(graph, sample=2000, rng=None):
+    # Mean local clustering coefficient over a sample of nodes
+    rng = rng or np.random.default_rng(0)
+    nodes = rng.choice(graph.n, min(sample, graph.n), replace=False)
+    total = 0.0
+    for u in nodes.tolist():
+        nb = graph.neighbors(u)
+        d = len(nb)
+        if d < 2: continue
+        links = np.isin(graph.expand(nb)[1], nb).sum() // 2
+        total += 2.0 * links / (d * (d - 1))
+    return total / len(nodes)
+
+def stats(graph):
+    deg = graph.degree()
+    return {'edges': len(graph), 'mean_degree': float(deg.mean()), 'degree_std': float(deg.std()),
+            'min_degree': int(deg.min()), 'clustering': clustering(graph)}
+
+def compare_networkx(model, n, k, p, seed=0, home=None):
+    # (ours, networkx) statistics for the same model and size
+    import networkx as nx
+    ours = generate(model, n, k, p, np.random.default_rng(seed), home)
+    if model == 'erdos_renyi': G = nx.fast_gnp_random_graph(n, min(1.0, k / max(1, n - 1)), seed=seed)
+    elif model == 'small_world': G = nx.watts_strogatz_graph(n, k, p, seed=seed)
+    else:
+        G = nx.watts_strogatz_graph(n, k, p, seed=seed)
+        hu, hv = household_edges(np.asarray(home))
+        G.add_edges_from(zip(hu.tolist(), hv.tolist()))
+    ref = ContactGraph.from_edges(n, np.array(G.edges, dtype=np.int32))
+    return stats(ours), stats(ref)
@@ -0,0 +1,240 @@
+import argparse
+import sys
+import time
+import numpy as np
+from config import CONFIG
+from engine import Engine
+import ensemble
+import sweep
+import graphs
+import bench
+from telemetry import Telemetry, missing
+
+def apply_overrides(args):
+    if getattr(args, 'pop', None) is not None: CONFIG.pop_size = args.pop
+    if getattr(args, 'infected', None) is not None: CONFIG.init_infected = args.infected
+    if getattr(args, 'speed', None) is not None: CONFIG.sim_speed = args.speed
+
+def latest(engine):
+    return engine.history.last()
+
+def run(days, quiet=False, out=sys.stdout, seed=None, resume=None, save=None, world_seed=None, profile=None, telemetry=None, record=None):
+    t0 = time.perf_counter()
+    engine = Engine(headless=True, seed=seed, checkpoint=resume, world_seed=world_seed)
+    init_s = time.perf_counter() - t0
+    prof = engine.profiler
+    prof.enabled = bool(profile)
+    if telemetry: engine.telemetry = Telemetry(telemetry)
+    if record: engine.record(record)
+
+    t0 = time.perf_counter()
+    last_day = start_day = engine.day
+    while engine.day < days:
+        with prof.phase('update'): engine.update()
+        if not quiet and engine.day != last_day:
+            last_day = engine.day
+            c = latest(engine)
+            out.write(f"day {engine.day:4d} | S {c['S']} Active {c['Active']} H {c['H']} R {c['R']} D {c['D']} | R_t {engine.tree.r_t(engine.sim_time):.2f}\n")
+    wall = time.perf_counter() - t0
+    if telemetry:
+        tel = engine.telemetry
+        tel.close()
+        if tel.error: out.write(f"telemetry stopped early: {tel.error}\n")
+        out.write(f"streamed {tel.written} records to {telemetry} ({tel.dropped} dropped)\n")
+    if record:
+        engine.recorder.close()
+        out.write(f"recorded {engine.recorder.events} events to {record}\n")
+    if save:
+        engine.save(save)
+        out.write(f"saved day {engine.day} checkpoint to {save}\n")
+
+    out.write(f"{len(engine.pop)} agents | {engine.pop.nbytes() / max(1, len(engine.pop)):.0f} bytes/agent\n")
+    if profile:
+        for name, st in prof.summary().items():
+            out.write(f"  {name:14s} p50 {st['p50_ms']:8.3f} ms  p95 {st['p95_ms']:8.3f} ms  total {st['total_ms'] / 1000:7.2f}s ({st['count']} calls)\n")
+        prof.export(profile)
+        out.write(f"wrote {profile}\n")
+    tree = engine.tree
+    out.write(f"{len(tree)} infections | R_t {tree.r_t(engine.sim_time):.2f} | generation interval {tree.generation_interval():.2f} days\n")
+    out.write("  by setting: " + "  ".join(f"{k} {v:.0%}" for k, v in sorted(tree.breakdown().items(), key=lambda kv: -kv[1])) + "\n")
+    ran = engine.day - start_day
+    out.write(f"init {init_s:.2f}s | {ran} days in {wall:.2f}s | {ran / max(wall, 1e-9):.2f} days/s\n")
+    return engine, wall
+
+def run_ensemble(args, out=sys.stdout):
+    t0 = time.perf_counter()
+    done = [0]
+    def progress(index, series):
+        done[0] += 1
+        if not args.quiet: out.write(f"replicate {index} done ({done[0]}/{args.replicates})\n")
+    res = ensemble.run_ensemble(CONFIG, replicates=args.replicates, days=args.days, seed=args.seed or 0,
+                                workers=args.workers, on_result=progress, world_seed=args.world_seed)
+    wall = time.perf_counter() - t0
+    peak = res.series[:, :, ensemble.SERIES.index('Active')].max(axis=1)
+    dead = res.band('D')
+    out.write(f"{args.replicates} replicates x {args.days} days in {wall:.2f}s\n")
+    out.write(f"peak active median {np.median(peak):.0f} [5-95%: {np.quantile(peak, 0.05):.0f}-{np.quantile(peak, 0.95):.0f}]\n")
+    out.write(f"dead at day {args.days} median {dead['median'][-1]:.0f} [5-95%: {dead['q05'][-1]:.0f}-{dead['q95'][-1]:.0f}]\n")
+    if args.out:
+        res.to_csv(args.out)
+        out.write(f"wrote {args.out}\n")
+    return res
+
+def run_fork(args, out=sys.stdout):
+    overrides = {}
+    for spec in args.set:
+        key, _, value = spec.partition('=')
+        if not hasattr(CONFIG, key): raise SystemExit(f"unknown parameter '{key}'")
+        overrides[key] = type(getattr(CONFIG, key))(value)
+    t0 = time.perf_counter()
+    res = ensemble.fork_ensemble(args.checkpoint, replicates=args.replicates, days=args.days, seed=args.seed or 0,
+                                 overrides=overrides, workers=args.workers)
+    wall = time.perf_counter() - t0
+    peak = res.series[:, :, ensemble.SERIES.index('Active')].max(axis=1)
+    dead = res.band('D')
+    out.write(f"{args.replicates} forks x {args.days} days in {wall:.2f}s\n")
+    out.write(f"peak active median {np.median(peak):.0f} [5-95%: {np.quantile(peak, 0.05):.0f}-{np.quantile(peak, 0.95):.0f}]\n")
+    out.write(f"dead after {args.days} days median {dead['median'][-1]:.0f} [5-95%: {dead['q05'][-1]:.0f}-{dead['q95'][-1]:.0f}]\n")
+    if args.out:
+        res.to_csv(args.out)
+        out.write(f"wrote {args.out}\n")
+    return res
+
+def check_graphs(args, out=sys.stdout):
+    n = int(CONFIG.pop_size)
+    home = (np.arange(n) % max(10, n // 5)).astype(np.int32)
+    models = [args.model] if args.model else graphs.MODELS
+    for model in models:
+        ours, ref = graphs.compare_networkx(model, n, CONFIG.k_neighbors, CONFIG.rewire_prob, seed=args.seed or 0, home=home)
+        out.write(f"{model}\n")
+        for key in ours:
+            out.write(f"  {key:12s} ours {ours[key]:10.3f}  networkx {ref[key]:10.3f}\n")
+
+def run_bench(args, out=sys.stdout):
+    sizes = [int(v) for v in args.sizes.split(',')] if args.sizes else bench.SIZES
+    if not args.quiet: out.write(f"{'size':>10s} {'benchmark':14s} {'median':>10s}\n")
+    doc = bench.run(sizes, repeat=args.repeat, seed=args.seed or 0, out=None if args.quiet else out)
+    if args.out:
+        bench.save(doc, args.out)
+        out.write(f"wrote {args.out}\n")
+    if args.baseline:
+        rows = bench.compare(doc, bench.load(args.baseline), args.tolerance)
+        for r in rows:
+            flag = 'REGRESSED' if r['regressed'] else ''
+            out.write(f"  {r['size']:>8d} {r['name']:14s} {r['baseline_ms']:10.3f} -> {r['current_ms']:10.3f} ms  x{r['ratio']:.2f} {flag}\n")
+        bad = sum(r['regressed'] for r in rows)
+        out.write(f"{bad} of {len(rows)} benchmarks more than {args.tolerance:.0%} slower than {args.baseline}\n")
+        if bad: raise SystemExit(1)
+    return doc
+
+def parse_axis(spec):
+    # "beta=20,40,60" for a grid axis, "beta=20:60" for a hypercube range
+    key, _, values = spec.partition('=')
+    if not hasattr(CONFIG, key): raise SystemExit(f"unknown parameter '{key}'")
+    cast = type(getattr(CONFIG, key))
+    if ':' in values:
+        lo, hi = values.split(':')
+        return key, (float(lo), float(hi)), cast
+    return key, [cast(v) for v in values.split(',')], cast
+
+def run_sweep(args, out=sys.stdout):
+    axes = [parse_axis(s) for s in args.grid]
+    ranges = [parse_axis(s) for s in args.lhs]
+    points = sweep.grid(**{k: v for k, v, _ in axes}) if axes else [{}]
+    if ranges:
+        design = sweep.latin_hypercube({k: v for k, v, _ in ranges}, args.samples, seed=args.seed or 0)
+        casts = {k: c for k, _, c in ranges}
+        design = [{k: casts[k](v) for k, v in d.items()} for d in design]
+        points = [dict(p, **d) for p in points for d in design]
+
+    t0 = time.perf_counter()
+    def progress(i, hit):
+        if not args.quiet: out.write(f"point {i} {'cached' if hit else 'done'} {points[i]}\n")
+    res = sweep.run_sweep(points, CONFIG, days=args.days, replicates=args.replicates, seed=args.seed or 0,
+                          workers=args.workers, cache_dir=args.cache, on_point=progress, world_seed=args.world_seed)
+    wall = time.perf_counter() - t0
+    out.write(f"{len(points)} points ({sum(res.cached)} cached) x {args.replicates} replicates x {args.days} days in {wall:.2f}s\n")
+    if args.out:
+        res.to_csv(args.out)
+        out.write(f"wrote {args.out}\n")
+    return res
+
+def add_world_args(p):
+    p.add_argument("--days", type=int, default=180)
+    p.add_argument("--pop", type=int, default=None)
+    p.add_argument("--infected", type=int, default=None)
+    p.add_argument("--speed", type=float, default=None)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--world-seed", type=int, default=None, help="reuse the cached world for this seed instead of drawing a new one")
+    p.add_argument("--quiet", action="store_true")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="headless", description="Run the epidemic engine without a display")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="simulate a fixed number of days as fast as possible")
+    add_world_args(p_run)
+    p_run.add_argument("--resume", default=None, help="start from a checkpoint instead of a fresh world")
+    p_run.add_argument("--save", default=None, help="write a checkpoint when the run ends")
+    p_run.add_argument("--telemetry", default=None, help="stream per-tick metrics to a file or unix:/socket (.arrow for Arrow IPC, else NDJSON)")
+    p_run.add_argument("--record", default=None, help="write an event log for 'main.py --replay'")
+    p_run.add_argument("--profile", default=None, help="time each update phase and write the summary (.json or .csv)")
+
+    p_ens = sub.add_parser("ensemble", help="run seeded replicates in parallel and report quantile bands")
+    add_world_args(p_ens)
+    p_ens.add_argument("--replicates", type=int, default=200)
+    p_ens.add_argument("--workers", type=int, default=None)
+    p_ens.add_argument("--out", default=None, help="CSV file for the per-day mean/median/5-95% bands")
+
+    p_fork = sub.add_parser("fork", help="branch seeded continuations from a checkpoint")
+    p_fork.add_argument("checkpoint")
+    p_fork.add_argument("--days", type=int, default=60, help="days to simulate past the checkpoint")
+    p_fork.add_argument("--seed", type=int, default=None)
+    p_fork.add_argument("--replicates", type=int, default=100)
+    p_fork.add_argument("--workers", type=int, default=None)
+    p_fork.add_argument("--set", action="append", default=[], metavar="FIELD=VALUE", help="Params override for every fork")
+    p_fork.add_argument("--out", default=None, help="CSV file for the per-day mean/median/5-95% bands")
+
+    p_sweep = sub.add_parser("sweep", help="run a grid or Latin-hypercube design over Params, reusing cached points")
+    add_world_args(p_sweep)
+    p_sweep.add_argument("--grid", action="append", default=[], metavar="FIELD=V1,V2,...")
+    p_sweep.add_argument("--lhs", action="append", default=[], metavar="FIELD=LO:HI")
+    p_sweep.add_argument("--samples", type=int, default=16, help="Latin-hypercube points")
+    p_sweep.add_argument("--replicates", type=int, default=8)
+    p_sweep.add_argument("--workers", type=int, default=None)
+    p_sweep.add_argument("--cache", default=".sweep_cache", help="result cache directory ('' to disable)")
+    p_sweep.add_argument("--out", default=None, help="CSV file with one summary row per point")
+
+    p_graphs = sub.add_parser("graphs", help="compare the built-in contact graphs with networkx (needs networkx)")
+    p_graphs.add_argument("--pop", type=int, default=None)
+    p_graphs.add_argument("--seed", type=int, default=None)
+    p_graphs.add_argument("--model", choices=graphs.MODELS, default=None)
+
+    p_bench = sub.add_parser("bench", help="time world setup, updates and each phase across population sizes")
+    p_bench.add_argument("--sizes", default=None, help=f"comma-separated population sizes (default {','.join(map(str, bench.SIZES))})")
+    p_bench.add_argument("--repeat", type=int, default=5)
+    p_bench.add_argument("--seed", type=int, default=None)
+    p_bench.add_argument("--out", default=None, help="write the results as a JSON baseline")
+    p_bench.add_argument("--baseline", default=None, help="compare against a saved baseline; exits 1 on a regression")
+    p_bench.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a benchmark counts as regressed")
+    p_bench.add_argument("--quiet", action="store_true")
+
+    args = parser.parse_args(argv)
+    apply_overrides(args)
+    if args.cmd == "run":
+        if args.telemetry and missing(args.telemetry):
+            raise SystemExit(f"--telemetry {args.telemetry} needs {missing(args.telemetry)}, which is not installed; stream to a .ndjson file instead")
+        run(args.days, quiet=args.quiet, seed=args.seed, resume=args.resume, save=args.save, world_seed=args.world_seed, profile=args.profile, telemetry=args.telemetry, record=args.record)
+    elif args.cmd == "ensemble":
+        run_ensemble(args)
+    elif args.cmd == "fork":
+        run_fork(args)
+    elif args.cmd == "sweep":
+        run_sweep(args)
+    elif args.cmd == "graphs":
+        check_graphs(args)
+    elif args.cmd == "bench":
+        run_bench(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import numpy as np
+
+KEYS = ('S', 'Active', 'R', 'D', 'H')
+
+def lttb(x, y, n_out):
+    # Largest-triangle-three-buckets: indices of n_out points that keep the
+    # visual shape of (x, y). The first and last points are always kept; each
+    # bucket in between contributes the point making the largest triangle with
+    # the previous pick and the mean of the next bucket
+    n = len(x)
+    if n_out >= n or n_out < 3: return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts = np.append(edges[:-1], n - 1)
+    counts = np.diff(np.append(edges, n))
+    mean_x = np.add.reduceat(x, starts) / counts
+    mean_y = np.add.reduceat(y, starts) / counts
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+class History:
+    # Compartment counts sampled over the whole run, stored column-wise in
+    # fixed-size numpy chunks: an append writes one row and never copies
+    # earlier samples. table() joins the chunks once per new sample, and the
+    # plot reads an LTTB-downsampled view of it
+    def __init__(self, keys=KEYS, chunk=4096):
+        self.keys = tuple(keys)
+        self.chunk = chunk
+        self.chunks = []
+        self.n = 0
+        self.cache = {}
+
+    def __len__(self):
+        return self.n
+
+    def append(self, values):
+        i = self.n % self.chunk
+        if i == 0: self.chunks.append(np.zeros((self.chunk, len(self.keys)), dtype=np.int64))
+        self.chunks[-1][i] = [values[k] for k in self.keys]
+        self.n += 1
+        self.cache.clear()
+
+    def table(self):
+        # (samples, keys) copy of the whole run
+        if 'table' not in self.cache:
+            full = np.concatenate(self.chunks) if self.chunks else np.zeros((0, len(self.keys)), dtype=np.int64)
+            self.cache['table'] = full[:self.n]
+        return self.cache['table']
+
+    def column(self, key):
+        return self.table()[:, self.keys.index(key)]
+
+    def last(self):
+        if self.n == 0: return {k: 0 for k in self.keys}
+        row = self.chunks[-1][(self.n - 1) % self.chunk]
+        return {k: int(v) for k, v in zip(self.keys, row)}
+
+    def downsampled(self, key, n_out):
+        # (sample indices, values) of at most n_out points, cached until the next append
+        if (key, n_out) not in self.cache:
+            y = self.column(key)
+            idx = lttb(np.arange(len(y)), y, n_out)
+            self.cache[(key, n_out)] = (idx, y[idx])
+        return self.cache[(key, n_out)]
+
+    def columns(self):
+        return {k: self.column(k) for k in self.keys}
+
+    @classmethod
+    def from_columns(cls, columns, chunk=4096):
+        hist = cls(columns, chunk)
+        table = np.stack([np.asarray(columns[k], dtype=np.int64) for k in hist.keys], axis=1) if columns else np.zeros((0, 0))
+        hist.n = len(table)
+        for start in range(0, hist.n, chunk):
+            block = np.zeros((chunk, len(hist.keys)), dtype=np.int64)
+            part = table[start:start + chunk]
+            block[:len(part)] = part
+            hist.chunks.append(block)
+        return hist
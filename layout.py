@@ -0,0 +1,254 @@
+import threading
+import numpy as np
+from config import (REPULSION_STRENGTH, REPULSION_RANGE, LAYOUT_EXACT_MAX, LAYOUT_MESH_CELL, MAX_SPEED, DAMPING,
+                    K_SOCIAL, K_HOME, K_WORK, L_SOCIAL, L_STRUCT, LAYOUT_ITERATIONS, LAYOUT_THREADED,
+                    LAYOUT_ALPHA_DECAY, LAYOUT_FREEZE_ENERGY, LAYOUT_FREEZE_ITERS)
+
+def half_neighbourhood(reach):
+    # Half of the (2*reach+1)^2 cell block around a cell, excluding the cell
+    # itself; the mirrored half is covered by applying each pair force to both ends
+    return [(dx, dy) for dx in range(0, reach + 1) for dy in range(-reach, reach + 1) if dx > 0 or dy > 0]
+
+def safe_normalize(diff, dist, rng):
+    out = diff / np.maximum(dist, 0.01)[:, None]
+    bad = np.flatnonzero(dist < 0.01)
+    if len(bad): out[bad] = rng.uniform(-0.1, 0.1, (len(bad), 2))
+    return out
+
+class ForceLayout:
+    # Spring-and-repulsion layout for the GRAPH view, iterating its own copy of
+    # a Population's graph positions. Repulsion pairs agents through a sorted cell list;
+    # above exact_max agents only pairs a few mesh cells apart are summed
+    # exactly and the rest of the repulsion range comes from an FFT
+    # convolution of the cell densities (P3M)
+    def __init__(self, pop, hub_graph_pos, contacts, iterations=LAYOUT_ITERATIONS, rng=None):
+        self.pop = pop
+        # Own generator: the layout may run on a worker thread next to the engine
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.hub_graph_pos = hub_graph_pos.astype(np.float64)
+        self.contacts = contacts
+        self.pos = pop.graph_pos.astype(np.float64)
+        self.vel = np.zeros_like(self.pos)
+        # Cooling factor on forces; without it the hard repulsion core keeps
+        # agents jittering at MAX_SPEED and the layout never comes to rest
+        self.alpha = 1.0
+        self.alpha_decay = LAYOUT_ALPHA_DECAY
+        self.iterations = iterations
+        self.exact_max = LAYOUT_EXACT_MAX
+        self.mesh_cell = LAYOUT_MESH_CELL
+        self.near_cells = 1
+        self.max_pairs = 4_000_000
+        self._kernel = None
+
+    def step(self, iterations=None):
+        for _ in range(self.iterations if iterations is None else iterations):
+            self.integrate(self.forces())
+
+    def forces(self):
+        gp = self.pos
+        acc = np.zeros_like(gp)
+        self.add_structural(gp, acc)
+        self.add_social(gp, acc)
+        self.add_repulsion(gp, acc)
+        return acc
+
+    def add_structural(self, gp, acc):
+        pop = self.pop
+        for hub_col, k_val in ((pop.home, K_HOME), (pop.assigned, K_WORK)):
+            has = hub_col >= 0
+            diff = self.hub_graph_pos[hub_col[has]] - gp[has]
+            dist = np.hypot(diff[:, 0], diff[:, 1])
+            pull = np.where(dist > 0, (dist - L_STRUCT) * k_val, 0.0)
+            acc[has] += safe_normalize(diff, dist, self.rng) * pull[:, None]
+
+    def add_social(self, gp, acc):
+        edges = self.contacts.edges()
+        u, v = edges[:, 0], edges[:, 1]
+        diff = gp[v] - gp[u]
+        dist = np.hypot(diff[:, 0], diff[:, 1])
+        pull = np.where(dist > 0, (dist - L_SOCIAL) * K_SOCIAL, 0.0)
+        self.scatter(acc, u, v, safe_normalize(diff, dist, self.rng) * pull[:, None])
+
+    def add_repulsion(self, gp, acc):
+        if len(gp) < 2: return
+        if len(gp) <= self.exact_max:
+            self.add_pair_repulsion(gp, acc, REPULSION_RANGE, 1)
+        else:
+            self.add_pair_repulsion(gp, acc, self.mesh_cell, self.near_cells)
+            self.add_mesh_repulsion(gp, acc)
+
+    def add_pair_repulsion(self, gp, acc, cell, reach):
+        cx = np.floor(gp[:, 0] / cell).astype(np.int64)
+        cy = np.floor(gp[:, 1] / cell).astype(np.int64)
+        cx -= cx.min() - reach
+        cy -= cy.min() - reach
+        span = int(cy.max()) + reach + 1
+        key = cx * span + cy
+
+        order = np.argsort(key, kind='stable')
+        skey = key[order]
+        cells, start, count = np.unique(skey, return_index=True, return_counts=True)
+
+        # Same-cell pairs (i < j within each run of the sorted order)
+        self.pair_block(gp, acc, order, start, count, cells, skey, same_cell=True)
+        for dx, dy in half_neighbourhood(reach):
+            self.pair_block(gp, acc, order, start, count, cells, skey + dx * span + dy)
+
+    def mesh_kernel(self, shape):
+        # Spectrum of the force per unit density at each cell offset, packed as
+        # Fx + i*Fy; zero inside the block that add_pair_repulsion sums exactly
+        key = (self.mesh_cell, self.near_cells, shape)
+        if self._kernel is None or self._kernel[0] != key:
+            h, reach = self.mesh_cell, self.near_cells
+            k = int(np.ceil(REPULSION_RANGE / h))
+            d = np.arange(-k, k + 1) * h
+            dx, dy = np.meshgrid(d, d, indexing='ij')
+            r2 = dx ** 2 + dy ** 2
+            far = (np.maximum(np.abs(dx), np.abs(dy)) > reach * h) & (r2 <= REPULSION_RANGE ** 2)
+            mag = np.where(far, REPULSION_STRENGTH / (np.maximum(r2, 1.0) * np.sqrt(np.maximum(r2, 1e-12))), 0.0)
+            self._kernel = (key, k, np.fft.fft2(mag * dx + 1j * mag * dy, s=shape))
+        return self._kernel[1], self._kernel[2]
+
+    def add_mesh_repulsion(self, gp, acc):
+        h = self.mesh_cell
+        k = int(np.ceil(REPULSION_RANGE / h))
+        # Same cell boundaries as add_pair_repulsion so near and far pairs partition cleanly
+        ix = np.floor(gp[:, 0] / h).astype(np.int64)
+        iy = np.floor(gp[:, 1] / h).astype(np.int64)
+        ix -= ix.min()
+        iy -= iy.min()
+        # Round the padded grid up so the cached kernel spectrum survives small drifts
+        shape = (-(-(int(ix.max()) + 1 + 2 * k) // 64) * 64, -(-(int(iy.max()) + 1 + 2 * k) // 64) * 64)
+        density = np.bincount(ix * shape[1] + iy, minlength=shape[0] * shape[1]).reshape(shape).astype(np.float64)
+        k, kernel = self.mesh_kernel(shape)
+        field = np.fft.ifft2(np.fft.fft2(density) * kernel)[ix + k, iy + k]
+        acc[:, 0] += field.real
+        acc[:, 1] += field.imag
+
+    def pair_block(self, gp, acc, order, start, count, cells, probe, same_cell=False):
+        pos = np.searchsorted(cells, probe)
+        pos = np.minimum(pos, len(cells) - 1)
+        hit = cells[pos] == probe
+        first = np.where(hit, start[pos], 0)
+        deg = np.where(hit, count[pos], 0)
+        rank = np.arange(len(order))
+        if same_cell:
+            # Only partners after this agent in its own cell
+            deg = first + deg - rank - 1
+            first = rank + 1
+
+        # Chunk so the expanded pair arrays stay bounded
+        cum = np.cumsum(deg)
+        lo = 0
+        while lo < len(order):
+            hi = int(np.searchsorted(cum, (cum[lo - 1] if lo else 0) + self.max_pairs, side='right'))
+            hi = max(hi, lo + 1)
+            d = deg[lo:hi]
+            total = int(d.sum())
+            if total:
+                src = np.repeat(rank[lo:hi], d)
+                offs = np.arange(total) - np.repeat(np.cumsum(d) - d, d)
+                dst = np.repeat(first[lo:hi], d) + offs
+                self.repel(gp, acc, order[src], order[dst])
+            lo = hi
+
+    def repel(self, gp, acc, i, j):
+        diff = gp[i] - gp[j]
+        dist_sq = diff[:, 0] ** 2 + diff[:, 1] ** 2
+        near = dist_sq <= REPULSION_RANGE ** 2
+        i, j, diff, dist_sq = i[near], j[near], diff[near], dist_sq[near]
+        strength = np.where(self.pop.home[i] == self.pop.home[j], REPULSION_STRENGTH * 0.1, REPULSION_STRENGTH)
+        mag = strength / np.maximum(dist_sq, 1.0)
+        self.scatter(acc, i, j, safe_normalize(diff, np.sqrt(dist_sq), self.rng) * mag[:, None])
+
+    def scatter(self, acc, a, b, f):
+        # Pair force f pulls a along f and pushes b against it
+        n = len(acc)
+        for axis in (0, 1):
+            acc[:, axis] += np.bincount(a, weights=f[:, axis], minlength=n)
+            acc[:, axis] -= np.bincount(b, weights=f[:, axis], minlength=n)
+
+    def integrate(self, acc):
+        self.vel += acc * self.alpha
+        self.alpha *= 1.0 - self.alpha_decay
+        self.vel *= DAMPING
+        speed = np.hypot(self.vel[:, 0], self.vel[:, 1])
+        fast = speed > MAX_SPEED
+        self.vel[fast] *= (MAX_SPEED / speed[fast])[:, None]
+        self.pos += self.vel
+
+    def kinetic_energy(self):
+        return float((self.vel ** 2).sum(axis=1).mean()) if len(self.vel) else 0.0
+
+class LayoutService:
+    # Runs a ForceLayout only while the GRAPH view is shown and stops it once
+    # the kinetic energy stays under LAYOUT_FREEZE_ENERGY. Results are published
+    # into three position buffers: the front one holds the latest finished
+    # positions, the renderer keeps the one positions() last handed it, and
+    # the worker writes into the third, so it never touches a buffer being read.
+    # pop.graph_pos always points at the front one.
+    def __init__(self, layout, threaded=LAYOUT_THREADED):
+        self.layout = layout
+        self.pop = layout.pop
+        self.buffers = [layout.pos.astype(np.float32) for _ in range(3)]
+        self.front = 0
+        self.reading = 0
+        self.pop.graph_pos = self.buffers[self.front]
+        self.active = False
+        self.frozen = False
+        self.calm_iters = 0
+        self.iterations_run = 0
+        self.version = 0    # bumped on every publish, so readers can tell the positions moved
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(target=self.run, name="layout", daemon=True)
+            self.thread.start()
+
+    def set_active(self, active):
+        # Switching back to GRAPH resumes from the last published positions
+        self.active = active
+        if active: self.wake.set()
+
+    def tick(self):
+        if self.thread is None and self.active and not self.frozen:
+            self.iterate()
+
+    def run(self):
+        while not self.stopping:
+            if not self.active or self.frozen:
+                self.wake.wait(0.1)
+                self.wake.clear()
+                continue
+            self.iterate()
+
+    def iterate(self):
+        layout = self.layout
+        layout.step()
+        self.iterations_run += layout.iterations
+        if layout.kinetic_energy() < LAYOUT_FREEZE_ENERGY: self.calm_iters += layout.iterations
+        else: self.calm_iters = 0
+        if self.calm_iters >= LAYOUT_FREEZE_ITERS: self.frozen = True
+        self.publish()
+
+    def publish(self):
+        with self.lock: back = next(i for i in range(3) if i != self.front and i != self.reading)
+        np.copyto(self.buffers[back], self.layout.pos)
+        with self.lock:
+            self.front = back
+            self.pop.graph_pos = self.buffers[back]
+            self.version += 1
+
+    def positions(self):
+        # The latest positions and their version, held for the caller until
+        # its next call; one reader (the renderer) at a time
+        with self.lock:
+            self.reading = self.front
+            return self.buffers[self.front], self.version
+
+    def stop(self):
+        self.stopping = True
+        self.wake.set()
+        if self.thread is not None: self.thread.join()
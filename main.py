@@ -1,95 +1,131 @@
+import argparse
+import contextlib
 import pygame
-from config import WIDTH, HEIGHT, SIM_W, CENTER_X, CENTER_Y, C_BG, C_EDGE_STATIC, RING_RAD_MID, RING_RAD_OUTER, FPS
+from config import SIM_THREADED, WORLD_SEED, WIDTH, HEIGHT, SIM_W, PANEL_W, C_PANEL, C_TEXT, C_TEXT_DIM, C_ACCENT, FPS
 from enums import LocationType, State
+from entities import Hub
 from engine import Engine
+from eventlog import EventLog, Replay
 from ui import UI
+from renderer import Renderer, hub_layer, draw_agents
+from stepper import Stepper, SimThread
 
-def main():
+def main(threaded=SIM_THREADED):
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("DSA Final Project: Complete Graph Vis")
     clock = pygame.time.Clock()
     
-    engine = Engine()
+    engine = Engine(world_seed=WORLD_SEED)
     ui = UI(engine)
+    prof = engine.profiler
     
-    graph_surf = pygame.Surface((SIM_W, HEIGHT), pygame.SRCALPHA)
+    renderer = Renderer()
+    # On the main thread the stepper runs between frames; with a sim thread
+    # the engine is locked only while events change it and while it is drawn
+    sim = SimThread(engine) if threaded else None
+    stepper = sim.stepper if sim else Stepper(engine)
+    lock = sim.lock if sim else contextlib.nullcontext()
     
     running = True
     while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT: running = False
-            for s in ui.sliders: 
-                if s.handle(event): pass
-            ui.btn_reset.handle(event)
-            ui.btn_pause.handle(event)
-            ui.btn_view.handle(event)
-            
-        ui.update()
-        engine.update()
-        
-        screen.fill(C_BG)
+        with lock:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT: running = False
+                for s in ui.sliders: 
+                    if s.handle(event): pass
+                ui.btn_reset.handle(event)
+                ui.btn_pause.handle(event)
+                ui.btn_view.handle(event)
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    prof.enabled = not prof.enabled
+                    prof.reset()
+            ui.update()
         
-        if engine.view_mode == "SIM":
-            for h in engine.households:
-                 pygame.draw.line(screen, (20,25,30), h.sim_pos, engine.market.sim_pos, 1)
-            for h in engine.hubs: h.draw(screen, "SIM")
-        else:
-            graph_surf.fill((0,0,0,0))
-            center = (CENTER_X, CENTER_Y)
-            pygame.draw.circle(graph_surf, (25, 30, 35, 100), center, RING_RAD_MID, 1)
-            pygame.draw.circle(graph_surf, (25, 30, 35, 100), center, RING_RAD_OUTER, 1)
-            
-            for p in engine.agents:
-                for hub in p.permanent_affiliations:
-                    if hub.type == LocationType.HOUSEHOLD:
-                        pygame.draw.line(graph_surf, C_EDGE_STATIC, p.graph_pos, hub.graph_pos, 1)
-
-            for p in engine.agents:
-                for hub, weight in p.structural_edges.items():
-                    if hub.type == LocationType.HOUSEHOLD: continue 
-                    if weight < 0.05: continue
-                    
-                    start = p.graph_pos
-                    end = hub.graph_pos
-                    
-                    base_col = (100, 100, 100)
-                    if hub.type == LocationType.MARKET: base_col = (200, 150, 50) 
-                    elif hub.type == LocationType.PARK: base_col = (50, 200, 50) 
-                    elif hub.type == LocationType.HOSPITAL: base_col = (200, 50, 200) 
-                    elif hub.type == LocationType.QUARANTINE: base_col = (200, 200, 50)
-                    elif hub.type == LocationType.CEMETERY: base_col = (200, 200, 200) 
-                    elif hub.type == LocationType.SCHOOL: base_col = (50, 100, 200) 
-                    elif hub.type == LocationType.WORKPLACE: base_col = (200, 100, 50) 
-                    
-                    alpha = int(255 * weight)
-                    col = (*base_col, alpha)
-                    width = 2 if weight > 0.8 else 1
-                    pygame.draw.line(graph_surf, col, start, end, width)
-
-            for p in engine.agents:
-                for friend in p.graph_neighbors:
-                    if p.id < friend.id: 
-                        col = C_EDGE_STATIC 
-                        width = 1
-                        if (p.state in [State.INF_SYMP, State.INF_ASYMP] and friend.state == State.SUSCEPTIBLE) or \
-                           (friend.state in [State.INF_SYMP, State.INF_ASYMP] and p.state == State.SUSCEPTIBLE):
-                            col = (255, 50, 50, 200) 
-                            width = 2
-                        pygame.draw.line(graph_surf, col, p.graph_pos, friend.graph_pos, width)
-            
-            screen.blit(graph_surf, (0,0))
-            for h in engine.hubs: h.draw(screen, "GRAPH")
+        if sim is None:
+            with prof.phase('update'): stepper.advance()
+        with prof.phase('layout'):
+            engine.layout.set_active(engine.view_mode == "GRAPH")
+            engine.layout.tick()
         
-        for p in engine.agents: p.draw(screen, engine.view_mode)
+        if sim is None and not stepper.render_due():
+            clock.tick(FPS)
+            continue
         
-        ui.draw_hud(screen, engine)
-        ui.draw(screen)
+        with lock:
+            renderer.draw(screen, engine, prof, sim.frame() if sim else None)
+            with prof.phase('render.ui'):
+                ui.draw_hud(screen, engine)
+                ui.draw(screen)
         
-        pygame.display.flip()
+        with prof.phase('render.flip'): pygame.display.flip()
         clock.tick(FPS)
 
+    if sim: sim.stop()
+    engine.layout.stop()
+    pygame.quit()
+
+def replay(path):
+    # Plays an event log recorded with 'headless.py run --record' without the engine.
+    # SPACE pauses, LEFT/RIGHT jump a day, UP/DOWN change speed, click or drag the bar to seek
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f"Replay: {path}")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("Consolas", 14)
+
+    log = EventLog(path)
+    rep = Replay(log)
+    hubs = [Hub(i, x, y, r, LocationType(t), label, cap, risk) for i, (x, y, r, t, label, cap, risk) in enumerate(log.header['hubs'])]
+    bar = pygame.Rect(20, HEIGHT - 30, SIM_W - 40, 10)
+    speed, paused, dragging = 1.0, False, False    # speed in simulated days per second
+    t = log.start
+    base = hub_layer(hubs, screen.get_size(), "SIM")
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT: running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE: running = False
+                elif event.key == pygame.K_SPACE: paused = not paused
+                elif event.key == pygame.K_RIGHT: t += 1.0
+                elif event.key == pygame.K_LEFT: t -= 1.0
+                elif event.key == pygame.K_UP: speed *= 2.0
+                elif event.key == pygame.K_DOWN: speed /= 2.0
+            elif event.type == pygame.MOUSEBUTTONDOWN and bar.inflate(0, 16).collidepoint(event.pos): dragging = True
+            elif event.type == pygame.MOUSEBUTTONUP: dragging = False
+        if dragging:
+            frac = min(1.0, max(0.0, (pygame.mouse.get_pos()[0] - bar.x) / bar.w))
+            t = log.start + frac * (log.end - log.start)
+
+        dt = clock.tick(FPS) / 1000.0
+        if not paused and not dragging: t += speed * dt
+        t = min(max(t, log.start), log.end)
+        rep.seek(t)
+
+        screen.blit(base, (0, 0))
+        draw_agents(screen, rep.positions(), rep.state, rep.vaccinated, 3)
+
+        pygame.draw.rect(screen, C_PANEL, (SIM_W, 0, PANEL_W, HEIGHT))
+        counts = rep.counts()
+        lines = [f"Day {t:6.2f} / {log.end:.2f}", f"Speed {speed:g} days/s{'  (paused)' if paused else ''}", ""]
+        lines += [f"{State(i).name.title():14s} {int(c)}" for i, c in enumerate(counts)]
+        for i, txt in enumerate(lines):
+            screen.blit(font.render(txt, True, C_TEXT), (SIM_W + 20, 20 + 20 * i))
+        screen.blit(font.render("SPACE pause  LEFT/RIGHT day  UP/DOWN speed", True, C_TEXT_DIM), (SIM_W + 20, HEIGHT - 40))
+
+        pygame.draw.rect(screen, (40, 45, 50), bar, border_radius=3)
+        done = (t - log.start) / max(1e-9, log.end - log.start)
+        pygame.draw.rect(screen, C_ACCENT, (bar.x, bar.y, int(bar.w * done), bar.h), border_radius=3)
+        pygame.display.flip()
+
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Interactive epidemic simulation")
+    parser.add_argument("--replay", default=None, metavar="LOG", help="play back an event log instead of simulating")
+    parser.add_argument("--threaded", action="store_true", default=SIM_THREADED, help="step the engine on its own thread")
+    args = parser.parse_args()
+    if args.replay: replay(args.replay)
+    else: main(args.threaded)
\ No newline at end of file
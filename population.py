@@ -0,0 +1,153 @@
+from collections.abc import Sequence
+import numpy as np
+from config import CONFIG
+from enums import State
+from entities import Person
+from counters import Compartments
+
+# Structural edge slots per agent: home, assigned school/work, then the
+# household's local market, hospital, quarantine, park, cafe and the cemetery
+SLOT_HOME, SLOT_ASSIGNED, SLOT_MARKET, SLOT_HOSP, SLOT_QUAR, SLOT_PARK, SLOT_CAFE, SLOT_CEMETERY = range(8)
+N_SLOTS = 8
+
+INFECTIOUS = (State.INF_ASYMP.value, State.INF_SYMP.value, State.HOSPITALIZED.value)
+
+class Population(Sequence):
+    def __init__(self, n, hubs, rng):
+        self.n = n
+        self.rng = rng
+        self.hubs = hubs
+        self.hub_pos = np.array([(h.sim_pos.x, h.sim_pos.y) for h in hubs], dtype=np.float32).reshape(-1, 2)
+        self.hub_radius = np.array([h.radius for h in hubs], dtype=np.float32)
+
+        self.state = np.full(n, State.SUSCEPTIBLE.value, dtype=np.int8)
+        self.age = np.zeros(n, dtype=np.int8)
+        self.mobility = np.zeros(n, dtype=np.int8)
+        self.vaccinated = np.zeros(n, dtype=bool)
+        self.in_quarantine = np.zeros(n, dtype=bool)
+        self.masked = np.zeros(n, dtype=bool)
+        self.superspreader = np.zeros(n, dtype=bool)
+
+        # Simulation clock (days) and per-agent event times; days_in_state and
+        # immunity are derived from these instead of being stepped every update
+        self.now = 0.0
+        self.state_since = np.zeros(n, dtype=np.float64)
+        self.immune_since = np.zeros(n, dtype=np.float64)
+        self.gen = np.zeros(n, dtype=np.int32)
+        self.death_gen = np.zeros(n, dtype=np.int32)
+        self.latent_dur = np.zeros(n, dtype=np.float32)
+        self.inf_dur = np.zeros(n, dtype=np.float32)
+        self.hospital_stay_dur = np.zeros(n, dtype=np.float32)
+        self.peak_shedding = np.zeros(n, dtype=np.float32)
+        self.immunity = np.zeros(n, dtype=np.float32)
+        self.constitution = np.zeros(n, dtype=np.float32)
+
+        # Hub indices into self.hubs, -1 for none
+        self.home = np.zeros(n, dtype=np.int32)
+        self.assigned = np.full(n, -1, dtype=np.int32)
+        self.target = np.zeros(n, dtype=np.int32)
+        self.current = np.zeros(n, dtype=np.int32)
+
+        self.sim_pos = np.zeros((n, 2), dtype=np.float32)
+        self.target_pos = np.zeros((n, 2), dtype=np.float32)
+        self.graph_pos = np.zeros((n, 2), dtype=np.float32)
+
+        self.edge_hub = np.full((n, N_SLOTS), -1, dtype=np.int32)
+        self.edge_w = np.zeros((n, N_SLOTS), dtype=np.float32)
+
+        # Movement is event-driven: `moving` marks agents still heading for
+        # target_pos, and an agent's edge weights fade from fade_from at the
+        # time of its last departure or arrival, by fade_gap at most, until fade_end
+        self.moving = np.zeros(n, dtype=bool)
+        self.fading = np.zeros(n, dtype=bool)
+        self.fade_from = np.zeros((n, N_SLOTS), dtype=np.float32)
+        self.fade_gap = np.zeros((n, N_SLOTS), dtype=np.float32)
+        self.fade_start = np.zeros(n, dtype=np.float64)
+        self.fade_end = np.zeros(n, dtype=np.float64)
+
+        self.compartments = Compartments(n)
+
+        # Social contact graph (contacts.ContactGraph), filled by the engine
+        self.contacts = None
+        # eventlog.EventRecorder told about every state, vaccination and target write
+        self.recorder = None
+
+    def __len__(self): return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [Person(self, j) for j in range(*i.indices(self.n))]
+        if i < 0: i += self.n
+        if not 0 <= i < self.n: raise IndexError(i)
+        return Person(self, i)
+
+    def nbytes(self):
+        total = sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray) and v is not self.hub_pos and v is not self.hub_radius)
+        return total + (self.contacts.nbytes() if self.contacts else 0)
+
+    def random_points(self, hub_idx):
+        k = len(hub_idx)
+        offset = self.rng.uniform(-1, 1, (k, 2)).astype(np.float32)
+        norm = np.hypot(offset[:, 0], offset[:, 1])
+        norm[norm == 0] = 1.0
+        scale = self.rng.uniform(0, 1, k) * (self.hub_radius[hub_idx] - 2)
+        return self.hub_pos[hub_idx] + offset * (scale / norm)[:, None]
+
+    def set_targets(self, idx, hub_idx):
+        idx = np.asarray(idx, dtype=np.int64)
+        hub_idx = np.broadcast_to(np.asarray(hub_idx, dtype=np.int32), idx.shape)
+        change = self.target[idx] != hub_idx
+        idx, hub_idx = idx[change], hub_idx[change]
+        if len(idx) == 0: return
+        self.target[idx] = hub_idx
+        self.target_pos[idx] = self.random_points(hub_idx)
+        self.moving[idx] = True
+        if self.recorder: self.recorder.targets(idx, hub_idx, self.target_pos[idx])
+
+    def days_in_state(self, idx=slice(None)):
+        return self.now - self.state_since[idx]
+
+    def current_immunity(self, idx=slice(None)):
+        return self.immunity[idx] * np.exp(-CONFIG.immunity_waning * (self.now - self.immune_since[idx]))
+
+    def shedding(self):
+        st = self.state
+        infectious = (st == INFECTIOUS[0]) | (st == INFECTIOUS[1]) | (st == INFECTIOUS[2])
+        progress = np.divide(self.now - self.state_since, self.inf_dur, out=np.full(self.n, -1.0), where=infectious & (self.inf_dur > 0))
+        valid = (progress >= 0) & (progress <= 1)
+        val = np.where(progress < 0.3, progress / 0.3, 1.0 - (progress - 0.3) / 0.7)
+        amt = np.where(valid, val * self.peak_shedding, 0.0)
+        amt[self.masked] *= (1.0 - CONFIG.mask_efficacy)
+        return amt
+
+    # All state and vaccination writes go through these so compartments stay exact
+    def set_state(self, idx, value):
+        idx = np.asarray(idx, dtype=np.int64)
+        if len(idx) == 0: return
+        value = np.broadcast_to(np.asarray(value, dtype=np.int8), idx.shape)
+        # Death is final; anything moving an agent out of it is a scheduling bug
+        if ((self.state[idx] == State.DEAD.value) & (value != State.DEAD.value)).any():
+            raise ValueError("set_state would move dead agents out of DEAD")
+        vax = self.vaccinated[idx]
+        self.compartments.move(self.state[idx], vax, value, vax)
+        self.state[idx] = value
+        if self.recorder: self.recorder.states(idx, value)
+
+    def set_vaccinated(self, idx, flag):
+        idx = np.asarray(idx, dtype=np.int64)
+        if len(idx) == 0: return
+        st = self.state[idx]
+        self.compartments.move(st, self.vaccinated[idx], st, np.full(len(idx), bool(flag)))
+        self.vaccinated[idx] = flag
+        if self.recorder: self.recorder.vaccinations(idx, flag)
+
+    def sample(self, predicate, pool, k):
+        # k distinct agents satisfying predicate(idx), from a pool of known size;
+        # rejection-samples while the pool is dense, scans only when it is sparse
+        k = min(k, pool)
+        if k <= 0: return np.zeros(0, dtype=np.int64)
+        if pool * 20 >= self.n:
+            draw = self.rng.integers(self.n, size=int(4 * k * self.n / pool) + 8)
+            draw = np.unique(draw[predicate(draw)])
+            if len(draw) >= k: return self.rng.permutation(draw)[:k]
+        cand = np.flatnonzero(predicate(np.arange(self.n)))
+        return self.rng.choice(cand, min(k, len(cand)), replace=False)
@@ -0,0 +1,78 @@
+import json
+import time
+import numpy as np
+
+class _Span:
+    __slots__ = ('prof', 'name', 't0')
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.prof.add(self.name, (time.perf_counter() - self.t0) * 1000.0)
+
+class _Off:
+    def __enter__(self): pass
+    def __exit__(self, *exc): pass
+
+OFF = _Off()
+
+class Profiler:
+    # Per-phase wall-clock timers. `with prof.phase("bio"): ...` records one
+    # sample in milliseconds into a ring buffer of the last `window` samples;
+    # when disabled, phase() hands back a shared no-op and records nothing
+    def __init__(self, enabled=False, window=240):
+        self.enabled = enabled
+        self.window = window
+        self.buffers = {}
+        self.counts = {}
+        self.totals = {}
+
+    def phase(self, name):
+        return _Span(self, name) if self.enabled else OFF
+
+    def add(self, name, ms):
+        buf = self.buffers.get(name)
+        if buf is None:
+            buf = self.buffers[name] = np.zeros(self.window)
+            self.counts[name] = 0
+            self.totals[name] = 0.0
+        buf[self.counts[name] % self.window] = ms
+        self.counts[name] += 1
+        self.totals[name] += ms
+
+    def reset(self):
+        self.buffers, self.counts, self.totals = {}, {}, {}
+
+    def recent(self, name):
+        return self.buffers[name][:min(self.counts[name], self.window)]
+
+    def summary(self):
+        # Rolling stats over the window, plus all-time count and total
+        out = {}
+        for name in self.buffers:
+            r = self.recent(name)
+            p50, p95, p99 = np.percentile(r, (50, 95, 99))
+            out[name] = {'mean_ms': float(r.mean()), 'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+                         'max_ms': float(r.max()), 'count': self.counts[name], 'total_ms': self.totals[name]}
+        return out
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def to_csv(self, path):
+        summary = self.summary()
+        cols = ['mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'count', 'total_ms']
+        with open(path, 'w') as f:
+            f.write(','.join(['phase'] + cols) + '\n')
+            for name, s in summary.items():
+                f.write(','.join([name] + [f"{s[c]:.4f}" if isinstance(s[c], float) else str(s[c]) for c in cols]) + '\n')
+
+    def export(self, path):
+        if path.endswith('.csv'): self.to_csv(path)
+        else: self.to_json(path)
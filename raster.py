@@ -0,0 +1,147 @@
+import numpy as np
+import pygame
+
+# Numpy rasterization for the renderer: agent dots are stamped straight into
+# the surface's pixel array and line segments are turned into pixel runs,
+# composited in one pass, so a frame costs a handful of array operations
+# rather than one pygame call per agent or edge.
+
+_offsets = {}
+
+def disc_offsets(radius, ring=False):
+    # Pixel offsets covered by a filled disc, or by its one-pixel outline
+    key = (radius, ring)
+    if key not in _offsets:
+        r = np.arange(-radius, radius + 1)
+        dx, dy = np.meshgrid(r, r, indexing='ij')
+        d2 = dx ** 2 + dy ** 2
+        inside = d2 <= radius * radius + radius * 0.8
+        if ring: inside &= d2 > (radius - 1) ** 2 + (radius - 1) * 0.8
+        _offsets[key] = (dx[inside].ravel(), dy[inside].ravel())
+    return _offsets[key]
+
+def stamp(pixels, x, y, value, offsets):
+    # Write value[i] under every offset around (x[i], y[i]). Dots clear of the
+    # border take one vectorized write per offset; the few near it are clipped
+    dx, dy = offsets
+    w, h = pixels.shape[:2]
+    r = int(max(np.abs(dx).max(), np.abs(dy).max()))
+    inner = (x >= r) & (x < w - r) & (y >= r) & (y < h - r)
+    xi, yi, vi = x[inner], y[inner], value[inner]
+    for ox, oy in zip(dx.tolist(), dy.tolist()): pixels[xi + ox, yi + oy] = vi
+    edge = np.flatnonzero(~inner)
+    if len(edge) == 0: return
+    px = (x[edge, None] + dx).ravel()
+    py = (y[edge, None] + dy).ravel()
+    v = np.repeat(value[edge], len(dx))
+    ok = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+    pixels[px[ok], py[ok]] = v[ok]
+
+def draw_dots(surface, pos, index, palette, radius, outline=None):
+    # One dot per row of pos in palette[index[i]]; needs a 32-bit surface
+    if len(pos) == 0: return
+    xy = np.rint(pos).astype(np.int64)
+    pixels = pygame.surfarray.pixels2d(surface)
+    try:
+        mapped = np.array([surface.map_rgb(c) for c in palette], dtype=np.int64).astype(pixels.dtype)
+        stamp(pixels, xy[:, 0], xy[:, 1], mapped[index], disc_offsets(radius))
+        if outline is not None:
+            ring = np.full(len(xy), surface.map_rgb(outline), dtype=np.int64).astype(pixels.dtype)
+            stamp(pixels, xy[:, 0], xy[:, 1], ring, disc_offsets(radius, ring=True))
+    finally:
+        del pixels
+
+def segment_pixels(p0, p1, width):
+    # DDA: each segment becomes max(|dx|, |dy|) + 1 pixels. The per-pixel steps
+    # are laid out end to end and summed, each segment's first step jumping
+    # from the previous segment's end to its own start. A width of 2 adds the
+    # neighbouring pixel across the line's minor axis
+    p0, p1 = np.rint(p0).astype(np.float64), np.rint(p1).astype(np.float64)
+    d = p1 - p0
+    steps = np.abs(d).max(axis=1)
+    count = steps.astype(np.int64) + 1
+    start = np.cumsum(count) - count
+    slope = d / np.maximum(steps, 1)[:, None]
+    xy = []
+    for c in range(2):
+        inc = np.repeat(slope[:, c], count)
+        inc[start] = p0[:, c] - np.concatenate([[0.0], p1[:-1, c]])
+        xy.append(np.rint(np.cumsum(inc)).astype(np.int64))
+    x, y = xy
+    seg = np.repeat(np.arange(len(p0)), count)
+    extra = np.flatnonzero(np.repeat(width > 1, count))
+    if len(extra):
+        steep = np.repeat(np.abs(d[:, 1]) > np.abs(d[:, 0]), count)[extra]
+        x = np.concatenate([x, x[extra] + steep])
+        y = np.concatenate([y, y[extra] + ~steep])
+        seg = np.concatenate([seg, seg[extra]])
+    return x, y, seg
+
+def draw_segments(surface, p0, p1, rgb, alpha, width=1):
+    # Composite line segments onto a per-pixel-alpha surface. Where several
+    # segments cross a pixel their coverage combines as 1 - prod(1 - alpha)
+    # and their colours average by alpha, so the order they come in does not
+    # matter; the result then goes over whatever the surface already holds.
+    # A single colour or a single alpha skips the per-segment weighting
+    k = len(p0)
+    if k == 0: return
+    x, y, seg = segment_pixels(p0, p1, np.broadcast_to(np.asarray(width), (k,)))
+    w, h = surface.get_size()
+    ids = x * h + y
+    ends = np.concatenate([p0, p1])
+    if ends.min() < 0 or ends[:, 0].max() >= w - 2 or ends[:, 1].max() >= h - 2:
+        ok = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        ids, seg = ids[ok], seg[ok]
+    rgb = np.asarray(rgb, dtype=np.float64)
+    alpha = np.minimum(np.asarray(alpha, dtype=np.float64) / 255.0, 0.999)
+    if alpha.ndim == 0:
+        a = None
+        hits = np.bincount(ids, minlength=w * h)
+        hit = np.flatnonzero(hits)
+        cover = hits[hit] * np.log1p(-alpha)
+    else:
+        a = alpha[seg]
+        cover = np.bincount(ids, weights=np.log1p(-a), minlength=w * h)
+        hit = np.flatnonzero(cover < 0)
+        cover = cover[hit]
+    if len(hit) == 0: return
+    if rgb.ndim == 1: col = rgb[None, :]
+    else:
+        wsum = hits[hit] if a is None else np.bincount(ids, weights=a, minlength=w * h)[hit]
+        wt = 1.0 if a is None else a
+        col = np.stack([np.bincount(ids, weights=wt * rgb[seg, c], minlength=w * h)[hit] for c in range(3)], axis=1) / wsum[:, None]
+    new_a = -np.expm1(cover).astype(np.float32)
+    hx, hy = hit // h, hit % h
+
+    # Blend on the packed 32-bit pixels: one gather and one scatter
+    shifts = surface.get_shifts()
+    pixels = pygame.surfarray.pixels2d(surface)
+    try:
+        old = pixels[hx, hy]
+        old_a = ((old >> shifts[3]) & 0xff).astype(np.float32) / 255.0
+        out_a = new_a + old_a * (1.0 - new_a)
+        keep = old_a * (1.0 - new_a) / np.maximum(out_a, 1e-6)
+        out = np.rint(out_a * 255.0).astype(pixels.dtype) << shifts[3]
+        for c in range(3):
+            old_c = ((old >> shifts[c]) & 0xff).astype(np.float32)
+            out |= np.rint(col[:, c].astype(np.float32) * (1.0 - keep) + old_c * keep).astype(pixels.dtype) << shifts[c]
+        pixels[hx, hy] = out
+    finally:
+        del pixels
+
+def bundle(p0, p1, cell, alpha):
+    # Level of detail for dense edge sets: segments whose ends fall in the same
+    # pair of cells merge into one between the cells' mean end points, as
+    # opaque as the segments it stands for would be together
+    a = np.floor(p0 / cell).astype(np.int64)
+    b = np.floor(p1 / cell).astype(np.int64)
+    key = ((a[:, 0] * 4096 + a[:, 1]) * 4096 + b[:, 0]) * 4096 + b[:, 1]
+    uniq, inv, count = np.unique(key, return_inverse=True, return_counts=True)
+    inv = inv.ravel()
+    m = len(uniq)
+    mean = lambda v: np.bincount(inv, weights=v, minlength=m) / count
+    q0 = np.stack([mean(p0[:, 0]), mean(p0[:, 1])], axis=1)
+    q1 = np.stack([mean(p1[:, 0]), mean(p1[:, 1])], axis=1)
+    a = np.broadcast_to(np.asarray(alpha, dtype=np.float64) / 255.0, (len(p0),))
+    merged = -np.expm1(np.bincount(inv, weights=np.log1p(-np.minimum(a, 0.999)), minlength=m))
+    return q0, q1, merged * 255.0
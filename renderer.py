@@ -0,0 +1,182 @@
+import numpy as np
+import pygame
+import raster
+from config import C_BG, C_EDGE_STATIC, CENTER_X, CENTER_Y, RING_RAD_MID, RING_RAD_OUTER, COLORS
+from config import RENDER_EDGE_LOD, RENDER_BUNDLE_CELL, RENDER_DOT_LOD, RENDER_EDGE_REFRESH
+from enums import LocationType, State
+
+STATE_KEYS = ['S', 'L', 'IA', 'IS', 'H', 'R', 'D']
+EDGE_COLORS = {LocationType.MARKET: (200, 150, 50), LocationType.PARK: (50, 200, 50), LocationType.HOSPITAL: (200, 50, 200),
+               LocationType.QUARANTINE: (200, 200, 50), LocationType.CEMETERY: (200, 200, 200),
+               LocationType.SCHOOL: (50, 100, 200), LocationType.WORKPLACE: (200, 100, 50)}
+INFECTIOUS = (State.INF_SYMP.value, State.INF_ASYMP.value)
+# Dot colour by state, with vaccinated susceptibles in the last slot
+PALETTE = [COLORS[k] for k in STATE_KEYS] + [COLORS['V']]
+VAX = len(STATE_KEYS)
+# Structural edge colour by hub type value
+TYPE_RGB = np.array([EDGE_COLORS.get(t, (100, 100, 100)) for t in LocationType], dtype=np.float64)
+INFECTION_EDGE = (255, 50, 50)
+_sprites = {}
+
+def same(a, b):
+    # Layer keys hold the objects a layer was built from (compared by identity) and version counters
+    return len(a) == len(b) and all(x == y if isinstance(x, int) else x is y for x, y in zip(a, b))
+
+def surface(size, alpha=False):
+    surf = pygame.Surface(size, pygame.SRCALPHA) if alpha else pygame.Surface(size)
+    # Match the display's pixel format when there is one, so blits are plain copies
+    if pygame.display.get_surface() is not None: surf = surf.convert_alpha() if alpha else surf.convert()
+    return surf
+
+def hub_layer(hubs, size, mode, background=C_BG):
+    # Hub discs, default borders and labels; background None leaves it transparent
+    surf = surface(size, alpha=background is None)
+    if background is None: surf.fill((0, 0, 0, 0))
+    else: surf.fill(background)
+    for h in hubs:
+        if mode == "GRAPH" and h.type == LocationType.HOUSEHOLD: continue
+        h.draw_base(surf, mode)
+    return surf
+
+def sprites(radius, outline):
+    key = (radius, outline)
+    if key not in _sprites:
+        out = []
+        for col in PALETTE:
+            dot = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+            pygame.draw.circle(dot, col, (radius, radius), radius)
+            if outline: pygame.draw.circle(dot, (20, 20, 20), (radius, radius), radius, 1)
+            out.append(dot)
+        _sprites[key] = out
+    return _sprites[key]
+
+def draw_agents(screen, pos, state, vaccinated, radius, outline=False):
+    # All dots in one pass over the pixel array; surfaces that are not 32-bit
+    # get pre-drawn sprites in a single blits call instead
+    if len(pos) > RENDER_DOT_LOD: radius = max(1, radius - 1)
+    index = np.where((state == State.SUSCEPTIBLE.value) & vaccinated, VAX, state)
+    if screen.get_bitsize() == 32:
+        raster.draw_dots(screen, pos, index, PALETTE, radius, (20, 20, 20) if outline else None)
+        return
+    dots = sprites(radius, outline)
+    corners = (np.rint(pos).astype(np.int32) - radius).tolist()
+    screen.blits([(dots[i], xy) for i, xy in zip(index.tolist(), corners)], doreturn=False)
+
+def draw_edges(surf, p0, p1, rgb, alpha, width=1):
+    # Above RENDER_EDGE_LOD segments, edges of one colour and width are bundled
+    # between grid cells, bundles shorter than a pixel are culled and, if
+    # still too many, every n-th is kept with its opacity raised to stand in
+    # for the ones left out
+    k = len(p0)
+    if k <= RENDER_EDGE_LOD:
+        raster.draw_segments(surf, p0, p1, rgb, alpha, width)
+        return
+    rgb = np.broadcast_to(np.asarray(rgb, dtype=np.float64), (k, 3))
+    width = np.broadcast_to(np.asarray(width), (k,))
+    styles, inv = np.unique(np.concatenate([rgb, width[:, None]], axis=1), axis=0, return_inverse=True)
+    inv = inv.ravel()
+    for g, style in enumerate(styles):
+        rows = np.flatnonzero(inv == g)
+        a = alpha if np.ndim(alpha) == 0 else alpha[rows]
+        q0, q1, merged = raster.bundle(p0[rows], p1[rows], RENDER_BUNDLE_CELL, a)
+        keep = np.flatnonzero(np.abs(q1 - q0).max(axis=1) >= 1.0)
+        stride = -(-len(keep) * k // (RENDER_EDGE_LOD * len(rows)))
+        if stride > 1:
+            keep = keep[::stride]
+            merged = -255.0 * np.expm1(stride * np.log1p(-np.minimum(merged / 255.0, 0.999)))
+        raster.draw_segments(surf, q0[keep], q1[keep], style[:3], merged[keep], int(style[3]))
+
+class Renderer:
+    # Draws the world in layers. Layers that almost never change are drawn once
+    # into cached surfaces keyed on what they depend on: the hubs and
+    # population (a new world) and, in GRAPH view, the layout's published
+    # version. Only the viral-load borders, edge weights, infection edges and
+    # agents are drawn every frame
+    def __init__(self):
+        self.layers = {}
+        self.scratch = None     # reused each frame for the dynamic GRAPH edges
+
+    def layer(self, name, key, build):
+        cached = self.layers.get(name)
+        if cached is None or not same(cached[0], key):
+            cached = self.layers[name] = (key, build())
+        return cached[1]
+
+    def draw(self, screen, engine, prof, frame=None):
+        # frame: (SIM positions, state, vaccinated) to draw the agents from
+        # instead of the live population, e.g. SimThread.frame()
+        size = screen.get_size()
+        hubs, pop = engine.hubs, engine.pop
+        sim_pos, state, vaccinated = frame if frame is not None else (pop.sim_pos, pop.state, pop.vaccinated)
+        if engine.view_mode == "SIM":
+            with prof.phase('render.hubs'):
+                screen.blit(self.layer('sim', (hubs, pop), lambda: self.sim_layer(engine, size)), (0, 0))
+                self.draw_loads(screen, engine, "SIM")
+            pos, radius = sim_pos, 3
+        else:
+            with prof.phase('render.graph'):
+                screen.fill(C_BG)
+                # While the layout is still moving the faint static edges are
+                # redrawn every RENDER_EDGE_REFRESH published versions, once
+                # it freezes they catch up with the final positions
+                # Positions are taken from the layout once, so everything in
+                # the frame comes from the same published version
+                layout = engine.layout
+                gp, version = layout.positions() if layout is not None else (pop.graph_pos, 0)
+                if not getattr(layout, 'frozen', True): version //= RENDER_EDGE_REFRESH
+                key = (hubs, pop, layout, version)
+                screen.blit(self.layer('graph.edges', key, lambda: self.graph_edges(engine, gp, size)), (0, 0))
+                screen.blit(self.dynamic_edges(engine, gp, size), (0, 0))
+                screen.blit(self.layer('graph.hubs', (hubs,), lambda: hub_layer(hubs, size, "GRAPH", None)), (0, 0))
+                self.draw_loads(screen, engine, "GRAPH")
+            pos, radius = gp, 4
+        with prof.phase('render.agents'):
+            draw_agents(screen, pos, state, vaccinated, radius, outline=engine.view_mode == "GRAPH")
+
+    def sim_layer(self, engine, size):
+        surf = surface(size)
+        surf.fill(C_BG)
+        for h in engine.households: pygame.draw.line(surf, (20, 25, 30), h.sim_pos, engine.market.sim_pos, 1)
+        for h in engine.hubs: h.draw_base(surf, "SIM")
+        return surf
+
+    def draw_loads(self, screen, engine, mode):
+        hubs = engine.hubs
+        for i in np.flatnonzero(engine.hub_load > 0.1).tolist():
+            if mode == "GRAPH" and hubs[i].type == LocationType.HOUSEHOLD: continue
+            hubs[i].draw_load(screen, mode)
+
+    def graph_edges(self, engine, gp, size):
+        # Rings, every agent's line home and the whole contact graph in its resting colour
+        pop = engine.pop
+        surf = surface(size, alpha=True)
+        surf.fill((0, 0, 0, 0))
+        center = (CENTER_X, CENTER_Y)
+        pygame.draw.circle(surf, (25, 30, 35, 100), center, RING_RAD_MID, 1)
+        pygame.draw.circle(surf, (25, 30, 35, 100), center, RING_RAD_OUTER, 1)
+        u, v = engine.contacts.edges().T
+        p0 = np.concatenate([gp, gp[u]])
+        p1 = np.concatenate([engine.hub_graph_pos[pop.home], gp[v]])
+        draw_edges(surf, p0, p1, C_EDGE_STATIC[:3], C_EDGE_STATIC[3])
+        return surf
+
+    def dynamic_edges(self, engine, gp, size):
+        # Structural edges whose weight is fading in or out, then infectious-to-susceptible contacts
+        pop = engine.pop
+        surf = self.scratch
+        if surf is None or surf.get_size() != size:
+            surf = self.scratch = surface(size, alpha=True)
+        surf.fill((0, 0, 0, 0))
+        agent, slot = np.nonzero((pop.edge_hub >= 0) & (pop.edge_w >= 0.05))
+        hub, w = pop.edge_hub[agent, slot], pop.edge_w[agent, slot]
+        keep = engine.hub_type[hub] != LocationType.HOUSEHOLD.value
+        agent, hub, w = agent[keep], hub[keep], w[keep]
+        draw_edges(surf, gp[agent], engine.hub_graph_pos[hub], TYPE_RGB[engine.hub_type[hub]],
+                   np.floor(255 * w), np.where(w > 0.8, 2, 1))
+
+        st = pop.state
+        src = np.flatnonzero((st == INFECTIOUS[0]) | (st == INFECTIOUS[1]))
+        src, dst = engine.contacts.expand(src)
+        hot = st[dst] == State.SUSCEPTIBLE.value
+        draw_edges(surf, gp[src[hot]], gp[dst[hot]], INFECTION_EDGE, 200, 2)
+        return surf
@@ -0,0 +1,21 @@
+class UniformBlock:
+    # Hands out U[0,1) draws from a pre-generated block so hot loops pay one
+    # generator call per block rather than one per draw. Draws are consumed
+    # in order, so a given seed always yields the same sequence.
+    def __init__(self, rng, size=1 << 16):
+        self.rng = rng
+        self.size = size
+        self.block = rng.random(size)
+        self.pos = 0
+
+    def take(self, k):
+        if k > self.size: return self.rng.random(k)
+        if self.pos + k > self.size:
+            self.block = self.rng.random(self.size)
+            self.pos = 0
+        out = self.block[self.pos:self.pos + k]
+        self.pos += k
+        return out
+
+    def next(self):
+        return float(self.take(1)[0])
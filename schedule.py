@@ -0,0 +1,117 @@
+import numpy as np
+from enums import AgeGroup, MobilityType, State
+from population import N_SLOTS, SLOT_ASSIGNED, SLOT_MARKET, SLOT_HOSP, SLOT_QUAR, SLOT_PARK, SLOT_CAFE, SLOT_CEMETERY
+
+# Where agents go at each of the day's ticks, as data. An itinerary is a list
+# of rules (cohort filter, {destination: probability}); for every cohort the
+# first rule whose filter matches applies and whatever probability is left
+# stays home. Destinations are edge slots, so they resolve to each agent's own
+# hub, plus VISIT, a household drawn at random. Health overrides come first
+# for every itinerary. Adding a behaviour is adding an entry to ITINERARIES
+# and, if it needs its own days, a case in day_kind.
+
+VISIT = N_SLOTS
+DESTINATIONS = (SLOT_ASSIGNED, SLOT_MARKET, SLOT_PARK, SLOT_CAFE, VISIT, SLOT_HOSP, SLOT_QUAR, SLOT_CEMETERY)
+WELL, SYMPTOMATIC, QUARANTINED, HOSPITALIZED, DEAD = range(5)
+AGES, MOBILITIES, HEALTH = len(AgeGroup), len(MobilityType), 5
+
+def everyone(age, mob):
+    return np.ones_like(age, dtype=bool)
+
+def homebound(age, mob):
+    return (age == AgeGroup.SENIOR.value) | (mob == MobilityType.LOW.value)
+
+def high_mobility(age, mob):
+    return mob == MobilityType.HIGH.value
+
+# Ill, isolated and dead agents ignore the itinerary (checked in this order)
+OVERRIDES = {DEAD: {SLOT_CEMETERY: 1.0}, HOSPITALIZED: {SLOT_HOSP: 1.0}, QUARANTINED: {SLOT_QUAR: 1.0}, SYMPTOMATIC: {}}
+
+def evening(s):
+    # Cafe for the highly mobile, else visiting another household, else the market
+    cafe, visit, market = 0.3 * s, 0.2 * s, 0.2 * s
+    return [(high_mobility, {SLOT_CAFE: cafe, VISIT: (1 - cafe) * visit, SLOT_MARKET: (1 - cafe) * (1 - visit) * market}),
+            (everyone, {VISIT: visit, SLOT_MARKET: (1 - visit) * market})]
+
+def morning(s):
+    # Children to school and workers to work; seniors and the less mobile shop
+    return [(homebound, {SLOT_MARKET: 0.15}), (everyone, {SLOT_ASSIGNED: 0.95})]
+
+def outing(s):
+    return [(everyone, {SLOT_PARK: 0.2 * s, SLOT_MARKET: 0.15 * s, SLOT_CAFE: 0.15 * s})]
+
+def essentials(s):
+    return [(everyone, {SLOT_MARKET: 0.02})]
+
+def home(s):
+    return []
+
+# day kind -> one itinerary per tick, each a function of social engagement
+ITINERARIES = {
+    'weekday': (morning, evening, home),
+    'weekend': (outing, evening, home),
+    'lockdown': (essentials, home, home),
+    'weekend_lockdown': (outing, home, home),
+}
+
+def day_kind(day, social):
+    weekend, lockdown = day % 7 >= 5, social < 0.4
+    if lockdown: return 'weekend_lockdown' if weekend else 'lockdown'
+    return 'weekend' if weekend else 'weekday'
+
+def health(pop):
+    # Health status per agent, with the overrides' precedence
+    st = pop.state
+    out = np.full(len(pop), WELL, dtype=np.int64)
+    out[st == State.INF_SYMP.value] = SYMPTOMATIC
+    out[pop.in_quarantine] = QUARANTINED
+    out[st == State.HOSPITALIZED.value] = HOSPITALIZED
+    out[st == State.DEAD.value] = DEAD
+    return out
+
+def compile_table(rules):
+    # Cumulative probabilities over DESTINATIONS for every cohort, shape
+    # (AGES * MOBILITIES * HEALTH, len(DESTINATIONS))
+    age, mob = np.divmod(np.arange(AGES * MOBILITIES), MOBILITIES)
+    probs = np.zeros((AGES * MOBILITIES, HEALTH, len(DESTINATIONS)))
+    col = {d: j for j, d in enumerate(DESTINATIONS)}
+    done = np.zeros(AGES * MOBILITIES, dtype=bool)
+    for match, dest in rules:
+        hit = match(age, mob) & ~done
+        for d, p in dest.items(): probs[hit, WELL, col[d]] = p
+        done |= hit
+    for h, dest in OVERRIDES.items():
+        for d, p in dest.items(): probs[:, h, col[d]] = p
+    cdf = np.cumsum(probs.reshape(-1, len(DESTINATIONS)), axis=1)
+    if (cdf[:, -1] > 1 + 1e-9).any(): raise ValueError("itinerary probabilities add up to more than 1")
+    return cdf
+
+class Schedule:
+    # Tables are compiled the first time a (day kind, tick, engagement) comes
+    # up and reused after; assigning targets is then one uniform draw per
+    # agent plus one for the households of those visiting
+    def __init__(self, households):
+        self.households = np.asarray(households, dtype=np.int32)
+        self.slots = np.minimum(np.array(DESTINATIONS), N_SLOTS - 1)
+        self.tables = {}
+        self.social = None
+
+    def table(self, kind, tick, social):
+        if social != self.social: self.tables, self.social = {}, social
+        key = (kind, tick)
+        if key not in self.tables: self.tables[key] = compile_table(ITINERARIES[kind][tick](social))
+        return self.tables[key]
+
+    def targets(self, pop, kind, tick, social, rng):
+        cdf = self.table(kind, tick, social)
+        cohort = (pop.age.astype(np.int64) * MOBILITIES + pop.mobility) * HEALTH + health(pop)
+        pick = (rng.random(len(pop))[:, None] >= cdf[cohort]).sum(axis=1)
+        out = pop.home.copy()
+        idx = np.flatnonzero(pick < len(DESTINATIONS))      # the rest stay home
+        pick = pick[idx]
+        hub = pop.edge_hub[idx, self.slots[pick]]
+        visit = np.flatnonzero(pick == DESTINATIONS.index(VISIT))
+        hub[visit] = self.households[rng.integers(len(self.households), size=len(visit))]
+        # An agent without a school or workplace stays home
+        out[idx] = np.where(hub >= 0, hub, pop.home[idx])
+        return out
@@ -0,0 +1,91 @@
+import contextlib
+import threading
+import time
+from config import CONFIG, FPS, SIM_FRAME_BUDGET, SIM_MAX_BACKLOG, SIM_MAX_FRAMESKIP
+
+# Fixed-timestep driving for the GUI. Every engine update is the same unit
+# step; the Time Warp slider sets how many updates are owed per wall second
+# (FPS * sim_speed), and each frame runs as many as the frame budget allows.
+# What is left over is carried to later frames, up to SIM_MAX_BACKLOG, past
+# which it is dropped: a machine that cannot keep up runs the sim slower, it
+# never takes bigger steps.
+
+class Stepper:
+    def __init__(self, engine, budget=SIM_FRAME_BUDGET, max_backlog=SIM_MAX_BACKLOG, frameskip=SIM_MAX_FRAMESKIP, lock=None):
+        self.engine = engine
+        self.budget = budget
+        self.max_backlog = max_backlog
+        self.frameskip = frameskip
+        self.lock = lock or contextlib.nullcontext()    # held around each update when stepping off the main thread
+        self.backlog = 0.0      # updates owed
+        self.last = None        # wall clock at the previous advance
+        self.steps = 0          # updates run by the last advance
+        self.dropped = 0.0      # updates given up since the start
+        self.skipped = 0        # frames skipped in a row
+
+    def advance(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.last is not None and not self.engine.paused:
+            self.backlog += (now - self.last) * FPS * CONFIG.sim_speed
+        self.last = now
+        steps = 0
+        while self.backlog >= 1.0:
+            with self.lock: self.engine.update(1.0)
+            self.backlog -= 1.0
+            steps += 1
+            if time.perf_counter() - now > self.budget: break
+        if self.backlog > self.max_backlog:
+            self.dropped += self.backlog - self.max_backlog
+            self.backlog = self.max_backlog
+        self.steps = steps
+        return steps
+
+    def render_due(self):
+        # With frame skipping on, a frame still owing updates goes undrawn, at
+        # most `frameskip` in a row, so the stepper gets the whole next frame
+        if self.backlog >= 1.0 and self.skipped < self.frameskip:
+            self.skipped += 1
+            return False
+        self.skipped = 0
+        return True
+
+class SimThread:
+    # Steps the engine on its own thread, a frame period at a time, and after
+    # each batch publishes a snapshot of what moves between frames (agent
+    # positions, states, vaccination). The renderer draws one period behind,
+    # interpolating between the two latest snapshots, so agents glide however
+    # the updates bunch up. Anything that changes the engine from outside,
+    # and drawing from it, holds `lock`; the thread takes it per update.
+    def __init__(self, engine, budget=1.0 / FPS):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.stepper = Stepper(engine, budget=budget, lock=self.lock)
+        self.period = 1.0 / FPS
+        self.snapshots = (None, None)   # previous, latest: (wall, pop, sim_pos, state, vaccinated)
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name="sim", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopping:
+            start = time.perf_counter()
+            self.stepper.advance(start)
+            with self.lock:
+                pop = self.engine.pop
+                snap = (time.perf_counter(), pop, pop.sim_pos.copy(), pop.state.copy(), pop.vaccinated.copy())
+            self.snapshots = (self.snapshots[1], snap)
+            time.sleep(max(0.0, self.period - (time.perf_counter() - start)))
+
+    def frame(self, now=None):
+        # (positions, state, vaccinated) to draw, or None before the first
+        # snapshot of the current population
+        prev, last = self.snapshots
+        if last is None or last[1] is not self.engine.pop: return None
+        if prev is None or prev[1] is not last[1] or last[0] <= prev[0]: return last[2], last[3], last[4]
+        now = time.perf_counter() if now is None else now
+        a = min(max((now - self.period - prev[0]) / (last[0] - prev[0]), 0.0), 1.0)
+        return prev[2] + (last[2] - prev[2]) * a, last[3], last[4]
+
+    def stop(self):
+        self.stopping = True
+        self.thread.join()
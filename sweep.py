@@ -0,0 +1,154 @@
+import ast
+import copy
+import hashlib
+import itertools
+import json
+import os
+import multiprocessing as mp
+import numpy as np
+from config import CONFIG
+import ensemble
+
+# The code version hashes the modules a sweep point actually runs: these and
+# every local module they import, directly or not. Renderer, GUI and CLI
+# edits leave it, and the cached points, alone
+MODEL_ROOTS = ('engine.py', 'ensemble.py', 'sweep.py')
+
+_code_version = None
+
+def model_modules(here):
+    seen, todo = set(), list(MODEL_ROOTS)
+    while todo:
+        name = todo.pop()
+        path = os.path.join(here, name)
+        if name in seen or not os.path.exists(path): continue
+        seen.add(name)
+        with open(path, 'rb') as f: tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import): todo += [a.name.split('.')[0] + '.py' for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level: todo.append(node.module.split('.')[0] + '.py')
+    return sorted(seen)
+
+def code_version():
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in model_modules(here):
+            h.update(name.encode())
+            with open(os.path.join(here, name), 'rb') as f: h.update(f.read())
+        _code_version = h.hexdigest()[:16]
+    return _code_version
+
+def grid(**axes):
+    # Full factorial design: grid(beta=[20, 40], kappa=[10, 20]) -> 4 points
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+def latin_hypercube(ranges, samples, seed=0):
+    # One point per stratum on every axis; ranges is {field: (lo, hi)}
+    rng = np.random.default_rng(seed)
+    points = [{} for _ in range(samples)]
+    for key, (lo, hi) in ranges.items():
+        u = (rng.permutation(samples) + rng.random(samples)) / samples
+        for p, v in zip(points, (lo + u * (hi - lo)).tolist()):
+            p[key] = v
+    return points
+
+def with_point(base, point):
+    params = copy.copy(base)
+    for key, value in point.items():
+        if not hasattr(params, key): raise AttributeError(f"Params has no field '{key}'")
+        setattr(params, key, value)
+    return params
+
+def point_key(params, seed, days, replicates, world_seed=None):
+    blob = json.dumps({'params': vars(params), 'seed': seed, 'world_seed': world_seed, 'days': days, 'replicates': replicates,
+                       'code': code_version()}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:32]
+
+class ResultCache:
+    # One .npz per sweep point, fanned out by key prefix. Writes go through a
+    # temp file and os.replace, so an interrupted sweep never leaves a torn entry
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + '.npz')
+
+    def get(self, key):
+        path = self.path(key)
+        if not os.path.exists(path): return None
+        with np.load(path) as f: return f['series']
+
+    def put(self, key, series, point):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, series=series, point=json.dumps(point))
+        os.replace(tmp, path)
+
+class SweepResult:
+    def __init__(self, points, series, cached):
+        self.points = points
+        self.series = series    # per point: (replicates, days + 1, len(SERIES))
+        self.cached = cached
+
+    def summary(self, point_index):
+        s = self.series[point_index]
+        peak = s[:, :, ensemble.SERIES.index('Active')].max(axis=1)
+        dead = s[:, -1, ensemble.SERIES.index('D')]
+        return {'peak_active_median': float(np.median(peak)), 'peak_active_q05': float(np.quantile(peak, 0.05)),
+                'peak_active_q95': float(np.quantile(peak, 0.95)), 'dead_median': float(np.median(dead)),
+                'dead_q05': float(np.quantile(dead, 0.05)), 'dead_q95': float(np.quantile(dead, 0.95))}
+
+    def to_csv(self, path):
+        keys = sorted({k for p in self.points for k in p})
+        stats = list(self.summary(0)) if self.points else []
+        with open(path, 'w') as f:
+            f.write(','.join(keys + stats + ['cached']) + '\n')
+            for i, p in enumerate(self.points):
+                s = self.summary(i)
+                f.write(','.join([str(p.get(k, '')) for k in keys] + [f"{s[k]:.2f}" for k in stats] + [str(int(self.cached[i]))]) + '\n')
+
+def run_sweep(points, base=None, days=180, replicates=8, seed=0, workers=None, cache_dir='.sweep_cache', on_point=None, world_seed=None):
+    # Every point uses the same replicate seeds (common random numbers), so
+    # differences between points come from the parameters rather than noise
+    base = base or CONFIG
+    cache = ResultCache(cache_dir) if cache_dir else None
+    seeds = ensemble.replicate_seeds(seed, replicates)
+    shape = (replicates, days + 1, len(ensemble.SERIES))
+    series = [None] * len(points)
+    cached = [False] * len(points)
+    keys, jobs = [], []
+    for i, point in enumerate(points):
+        params = with_point(base, point)
+        keys.append(point_key(params, seed, days, replicates, world_seed))
+        hit = cache.get(keys[i]) if cache else None
+        if hit is not None and hit.shape == shape:
+            series[i], cached[i] = hit, True
+            if on_point: on_point(i, True)
+            continue
+        series[i] = np.zeros(shape, dtype=np.int32)
+        jobs += [((i, r), params, s, days, world_seed) for r, s in enumerate(seeds)]
+
+    remaining = {}
+    for job in jobs: remaining[job[0][0]] = remaining.get(job[0][0], 0) + 1
+
+    def collect(index, s):
+        i, r = index
+        series[i][r] = s
+        remaining[i] -= 1
+        if remaining[i] == 0:
+            if cache: cache.put(keys[i], series[i], points[i])
+            if on_point: on_point(i, False)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs: collect(*ensemble.run_replicate(job))
+    elif jobs:
+        with mp.Pool(min(workers, len(jobs))) as pool:
+            for index, s in pool.imap_unordered(ensemble.run_replicate, jobs):
+                collect(index, s)
+    return SweepResult(points, series, cached)
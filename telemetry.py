@@ -0,0 +1,155 @@
+import importlib.util
+import json
+import math
+import queue
+import socket
+import threading
+import numpy as np
+from enums import State
+from config import TELEMETRY_QUEUE, TELEMETRY_BATCH
+
+# Per-tick metrics streamed out of a running engine. The stepping thread only
+# builds a small dict and puts it on a bounded queue; a writer thread encodes
+# and writes in batches. If the sink falls behind and the queue fills, records
+# are dropped and counted rather than blocking the simulation.
+
+FORMATS = ('ndjson', 'arrow')
+FLOAT_FIELDS = ('time', 'r_t', 'generation_interval')
+_STOP = object()
+
+def open_sink(target):
+    # "unix:/path/to.sock" streams to a listening Unix socket, anything else is a file
+    if target.startswith('unix:'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[len('unix:'):])
+        stream = sock.makefile('wb')
+        sock.close()    # the file object keeps the connection open
+        return stream
+    return open(target, 'wb')
+
+def finite(x):
+    return None if math.isnan(x) else x
+
+def guess_format(target):
+    return 'arrow' if target.endswith(('.arrow', '.arrows')) else 'ndjson'
+
+def missing(target, fmt=None):
+    # The package a sink's format needs and cannot import, or None
+    if (fmt or guess_format(target)) == 'arrow' and importlib.util.find_spec('pyarrow') is None: return 'pyarrow'
+    return None
+
+class NdjsonEncoder:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, records):
+        lines = []
+        for r in records:
+            r = {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in r.items()}
+            lines.append(json.dumps(r, separators=(',', ':')))
+        self.stream.write(('\n'.join(lines) + '\n').encode())
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+class ArrowEncoder:
+    # Arrow IPC stream format (not the random-access file format), so it also
+    # works over a socket; the schema is fixed by the first record
+    def __init__(self, stream):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Arrow telemetry needs pyarrow; use the ndjson format without it") from None
+        self.pa = pa
+        self.stream = stream
+        self.writer = None
+
+    def write(self, records):
+        pa = self.pa
+        if self.writer is None:
+            types = {k: pa.list_(pa.float32()) if isinstance(v, np.ndarray) else pa.float64() if k in FLOAT_FIELDS else pa.int64()
+                     for k, v in records[0].items()}
+            self.schema = pa.schema(list(types.items()))
+            self.writer = pa.ipc.new_stream(self.stream, self.schema)
+        cols = []
+        for field in self.schema:
+            vals = [r[field.name] for r in records]
+            if isinstance(field.type, pa.ListType):
+                offsets = np.concatenate([[0], np.cumsum([len(v) for v in vals])]).astype(np.int32)
+                cols.append(pa.ListArray.from_arrays(offsets, np.concatenate(vals).astype(np.float32)))
+            else: cols.append(pa.array(vals, type=field.type))
+        self.writer.write_batch(pa.RecordBatch.from_arrays(cols, schema=self.schema))
+        self.stream.flush()
+
+    def close(self):
+        if self.writer is not None: self.writer.close()
+        self.stream.close()
+
+class Telemetry:
+    def __init__(self, target, fmt=None, hub_loads=True, queue_size=TELEMETRY_QUEUE, batch=TELEMETRY_BATCH):
+        fmt = fmt or guess_format(target)
+        if fmt not in FORMATS: raise ValueError(f"unknown telemetry format '{fmt}', expected one of {FORMATS}")
+        stream = open_sink(target)
+        try:
+            self.encoder = ArrowEncoder(stream) if fmt == 'arrow' else NdjsonEncoder(stream)
+        except ImportError:
+            stream.close()
+            raise
+        self.hub_loads = hub_loads
+        self.batch = batch
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self.last = None    # infections so far at the previous record
+        self.thread = threading.Thread(target=self.drain, name='telemetry', daemon=True)
+        self.thread.start()
+
+    def record(self, engine):
+        comp = engine.pop.compartments
+        tree = engine.tree
+        new = len(tree) - self.last if self.last is not None else len(tree)
+        self.last = len(tree)
+        r, gi = tree.r_t(engine.sim_time), tree.generation_interval()
+        out = {'day': engine.day, 'tick': engine.tick, 'time': engine.sim_time, **comp.snapshot(),
+               'infectious': comp.count(State.INF_ASYMP, State.INF_SYMP), 'hosp_capacity': engine.hosp_capacity,
+               'new_infections': new, 'r_t': finite(r), 'generation_interval': finite(gi)}
+        if self.hub_loads: out['hub_load'] = engine.hub_load.copy()
+        return out
+
+    def emit(self, engine):
+        try:
+            self.queue.put_nowait(self.record(engine))
+        except queue.Full:
+            self.dropped += 1
+
+    def drain(self):
+        while True:
+            item = self.queue.get()
+            stop = item is _STOP
+            records = [] if stop else [item]
+            while not stop and len(records) < self.batch:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP: stop = True
+                else: records.append(item)
+            if records and self.error is None:
+                try:
+                    self.encoder.write(records)
+                    self.written += len(records)
+                except Exception as e:
+                    # A closed socket or full disk ends the stream, not the run
+                    self.error = e
+            if stop: return
+
+    def close(self):
+        # Flushes everything still queued; blocks until the writer is done
+        self.queue.put(_STOP)
+        self.thread.join()
+        try:
+            self.encoder.close()
+        except Exception as e:
+            self.error = self.error or e
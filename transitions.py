@@ -0,0 +1,57 @@
+import heapq
+import numpy as np
+
+ONSET, ADMIT, DEATH, RECOVER, WANE = range(5)
+
+class TransitionScheduler:
+    # Min-heap of (due_time, agent, kind, gen). An entry is stale once the
+    # agent's generation counter for that kind has moved on, and is dropped
+    # when popped. Callers that supersede entries in bulk report how many
+    # with retire(), and once those are half the heap it is rebuilt without them.
+    def __init__(self):
+        self.heap = []
+        self.stale = 0
+
+    def __len__(self): return len(self.heap)
+
+    def clear(self):
+        self.heap = []
+        self.stale = 0
+
+    def retire(self, k, gens):
+        self.stale += k
+        if self.stale > len(self.heap) // 2: self.compact(gens)
+
+    def compact(self, gens):
+        # Drop every stale entry in one pass and re-heapify
+        heap = self.heap
+        if heap:
+            kind = np.array([e[2] for e in heap])
+            agent = np.array([e[1] for e in heap])
+            gen = np.array([e[3] for e in heap])
+            live = np.zeros(len(heap), dtype=bool)
+            for k in np.unique(kind).tolist():
+                m = kind == k
+                live[m] = gens[k][agent[m]] == gen[m]
+            heap = [e for e, ok in zip(heap, live.tolist()) if ok]
+            heapq.heapify(heap)
+        self.heap = heap
+        self.stale = 0
+
+    def push(self, times, agents, kind, gens):
+        heap = self.heap
+        for t, a, g in zip(np.asarray(times).tolist(), np.asarray(agents).tolist(), np.asarray(gens).tolist()):
+            if t != float('inf'): heapq.heappush(heap, (t, a, kind, g))
+
+    def next_time(self):
+        return self.heap[0][0] if self.heap else float('inf')
+
+    def pop_due(self, now, gens):
+        # Returns {kind: array of agents} for every live entry due by `now`;
+        # gens[kind] is the generation column that entries of that kind check
+        heap = self.heap
+        due = {}
+        while heap and heap[0][0] <= now:
+            _, a, kind, g = heapq.heappop(heap)
+            if gens[kind][a] == g: due.setdefault(kind, []).append(a)
+        return {k: np.array(v, dtype=np.int64) for k, v in due.items()}
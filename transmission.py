@@ -0,0 +1,116 @@
+import numpy as np
+from enums import LocationType
+
+# Settings are the hub types, then infection over a contact-graph edge, then
+# the index cases seeded at the start
+SOCIAL = len(LocationType)
+SEED = SOCIAL + 1
+SETTINGS = tuple(t.name.lower() for t in LocationType) + ('social', 'seed')
+GI_MAX = 60         # days; longer generation intervals are counted in the last bin
+COLUMNS = ('child', 'parent', 'parent_row', 'time', 'setting', 'hub')
+
+class TransmissionTree:
+    # One row per infection in the order they happen: who, by whom (-1 for a
+    # seed), the infector's own infection row, when, in which setting and at
+    # which hub (-1 off-hub). Columns double when full, and `latest` maps each
+    # agent to their most recent row, so reinfections start a new branch.
+    # The estimators (daily incidence, setting counts, generation-interval
+    # histogram) are updated as rows arrive, O(new infections) per step
+    def __init__(self, n, capacity=1024):
+        self.size = 0
+        self.child = np.zeros(capacity, dtype=np.int32)
+        self.parent = np.zeros(capacity, dtype=np.int32)
+        self.parent_row = np.zeros(capacity, dtype=np.int64)
+        self.time = np.zeros(capacity, dtype=np.float64)
+        self.setting = np.zeros(capacity, dtype=np.int8)
+        self.hub = np.zeros(capacity, dtype=np.int32)
+        self.latest = np.full(n, -1, dtype=np.int64)
+        self.daily = np.zeros(64, dtype=np.int64)
+        self.by_setting = np.zeros(len(SETTINGS), dtype=np.int64)
+        self.gi_hist = np.zeros(GI_MAX + 1, dtype=np.int64)
+        self.gi_sum = 0.0
+
+    def __len__(self):
+        return self.size
+
+    def grow(self, need):
+        cap = len(self.child)
+        if need <= cap: return
+        while cap < need: cap *= 2
+        for name in COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(cap, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self, child, parent, t, setting, hub=-1):
+        child = np.asarray(child, dtype=np.int64)
+        k = len(child)
+        if k == 0: return
+        self.grow(self.size + k)
+        rows = np.arange(self.size, self.size + k)
+        parent = np.broadcast_to(np.asarray(parent, dtype=np.int64), (k,))
+        prow = np.where(parent >= 0, self.latest[np.maximum(parent, 0)], -1)
+        self.child[rows] = child
+        self.parent[rows] = parent
+        self.parent_row[rows] = prow
+        self.time[rows] = t
+        self.setting[rows] = setting
+        self.hub[rows] = hub
+        self.latest[child] = rows
+        self.size += k
+        self.count(rows)
+
+    def count(self, rows):
+        # Fold rows into the running estimates
+        days = self.time[rows].astype(np.int64)
+        if days.max() >= len(self.daily):
+            grown = np.zeros(max(2 * len(self.daily), days.max() + 1), dtype=np.int64)
+            grown[:len(self.daily)] = self.daily
+            self.daily = grown
+        np.add.at(self.daily, days, 1)
+        self.by_setting += np.bincount(self.setting[rows], minlength=len(SETTINGS))
+        prow = self.parent_row[rows]
+        prow = prow[prow >= 0]
+        if len(prow):
+            gi = self.time[rows][self.parent_row[rows] >= 0] - self.time[prow]
+            self.gi_sum += gi.sum()
+            np.add.at(self.gi_hist, np.minimum(np.rint(gi).astype(np.int64), GI_MAX), 1)
+
+    def generation_interval(self):
+        # Mean days from an infector's infection to the infections they cause
+        n = self.gi_hist.sum()
+        return self.gi_sum / n if n else float('nan')
+
+    def r_t(self, now, window=7):
+        # Instantaneous reproduction number (Cori et al.): infections over the
+        # last `window` whole days against the infectiousness carried into them
+        # by earlier infections, weighted by the observed generation intervals.
+        # The current, unfinished day is left out
+        w = self.gi_hist[1:].astype(np.float64)
+        today = int(now)
+        if w.sum() == 0 or today < 1: return float('nan')
+        w /= w.sum()
+        inc = self.daily[:today].astype(np.float64)
+        lam = np.convolve(inc, np.concatenate([[0.0], w]))[:today]
+        lo = max(0, today - window)
+        den = lam[lo:].sum()
+        return inc[lo:].sum() / den if den > 0 else float('nan')
+
+    def breakdown(self):
+        # Share of infections by setting, seeds left out
+        counts = self.by_setting[:SEED]
+        total = counts.sum()
+        return {SETTINGS[i]: float(counts[i] / total) for i in np.flatnonzero(counts)} if total else {}
+
+    def rows(self):
+        return {name: getattr(self, name)[:self.size] for name in COLUMNS}
+
+    @classmethod
+    def from_arrays(cls, n, columns, latest):
+        tree = cls(n, max(1024, len(columns['child'])))
+        tree.size = len(columns['child'])
+        for name in COLUMNS: getattr(tree, name)[:tree.size] = columns[name]
+        tree.latest[:] = latest
+        if tree.size: tree.count(np.arange(tree.size))
+        return tree
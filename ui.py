@@ -1,4 +1,5 @@
 import pygame
+import numpy as np
 from config import SIM_W, PANEL_W, HEIGHT, C_TEXT, C_TEXT_DIM, C_ACCENT, C_PANEL, C_BORDER, CONFIG, COLORS
 from enums import State
 
@@ -123,27 +124,16 @@ class UI:
         surface.blit(self.font_lg.render(mode_txt, True, col), (ox+240, 375))
         
         y = 400
-        c = {k:0 for k in COLORS}
-        vax_count = 0
-        for p in self.engine.agents: 
-            if p.vaccinated: vax_count += 1
-            k='S'
-            if p.state == State.LATENT: k='L'
-            elif p.state == State.INF_ASYMP: k='IA'
-            elif p.state == State.INF_SYMP: k='IS'
-            elif p.state == State.HOSPITALIZED: k='H'
-            elif p.state == State.RECOVERED: k='R'
-            elif p.state == State.DEAD: k='D'
-            c[k]+=1
+        comp = self.engine.pop.compartments
         
         lines = [
-            (f"Susceptible: {c['S']}", COLORS['S']),
-            (f"Vaccinated: {vax_count}", COLORS['V']),
-            (f"Latent: {c['L']}", COLORS['L']),
-            (f"Infectious: {c['IA']+c['IS']}", COLORS['IS']),
-            (f"Hospitalized: {c['H']} / {self.engine.hosp.capacity}", COLORS['H']),
-            (f"Recovered: {c['R']}", COLORS['R']),
-            (f"Dead: {c['D']}", COLORS['D'])
+            (f"Susceptible: {comp[State.SUSCEPTIBLE]}", COLORS['S']),
+            (f"Vaccinated: {comp.vaccinated}", COLORS['V']),
+            (f"Latent: {comp[State.LATENT]}", COLORS['L']),
+            (f"Infectious: {comp.count(State.INF_ASYMP, State.INF_SYMP)}", COLORS['IS']),
+            (f"Hospitalized: {comp[State.HOSPITALIZED]} / {self.engine.hosp_capacity}", COLORS['H']),
+            (f"Recovered: {comp[State.RECOVERED]}", COLORS['R']),
+            (f"Dead: {comp[State.DEAD]}", COLORS['D'])
         ]
         
         for txt, col in lines:
@@ -163,6 +153,12 @@ class UI:
             surface.blit(self.font.render(txt, True, C_TEXT_DIM), (ox+20, y_dem))
             y_dem += 20
 
+        tree = self.engine.tree
+        r_t, gi = tree.r_t(self.engine.sim_time), tree.generation_interval()
+        top = sorted(tree.breakdown().items(), key=lambda kv: -kv[1])[:4]
+        surface.blit(self.font.render(f"R_t: {r_t:.2f}   Gen. interval: {gi:.1f} d", True, C_TEXT), (ox+20, y_dem))
+        surface.blit(self.font.render("  ".join(f"{k} {v:.0%}" for k, v in top), True, C_TEXT_DIM), (ox+20, y_dem + 20))
+
         gw, gh = PANEL_W - 40, 200
         gy = HEIGHT - 220
         gx = ox + 20
@@ -170,17 +166,14 @@ class UI:
         pygame.draw.rect(surface, C_BORDER, (gx, gy, gw, gh), 1)
         
         hist = self.engine.history
-        if len(hist['S']) > 2:
+        if len(hist) > 2:
+            # The whole run squeezed into the plot, about one point per pixel column
             max_p = max(1, len(self.engine.agents))
+            step_x = gw / (len(hist) - 1)
             series = [('S', COLORS['S']), ('Active', COLORS['IS']), ('H', COLORS['H']), ('R', COLORS['R']), ('D', COLORS['D'])]
             for key, col in series:
-                pts = []
-                data = hist[key]
-                step_x = gw / max(1, len(data)-1)
-                for i, v in enumerate(data):
-                    px = gx + i * step_x
-                    py = (gy + gh) - (v / max_p) * gh
-                    pts.append((px, py))
+                idx, data = hist.downsampled(key, gw)
+                pts = np.stack([gx + idx * step_x, (gy + gh) - (data / max_p) * gh], axis=1).tolist()
                 if len(pts) > 1: pygame.draw.lines(surface, col, False, pts, 2)
 
     def draw_hud(self, surface, engine):
@@ -194,4 +187,21 @@ class UI:
         pill = txt.get_rect(center=(mx, y)).inflate(40, 16)
         pygame.draw.rect(surface, (30,30,40), pill, border_radius=15)
         pygame.draw.rect(surface, (60,60,70), pill, 1, border_radius=15)
-        surface.blit(txt, txt.get_rect(center=(mx, y)))
\ No newline at end of file
+        surface.blit(txt, txt.get_rect(center=(mx, y)))
+        if engine.profiler.enabled: self.draw_profile(surface, engine.profiler)
+
+    def draw_profile(self, surface, prof):
+        # F3 overlay: rolling p50 / p95 per phase, in milliseconds
+        rows = prof.summary()
+        if not rows: return
+        x, y = 20, 60
+        box = pygame.Surface((230, 26 + 16 * len(rows)), pygame.SRCALPHA)
+        box.fill((20, 20, 28, 210))
+        surface.blit(box, (x, y))
+        for col, head in ((8, "phase"), (140, "p50 ms"), (185, "p95 ms")):
+            surface.blit(self.font.render(head, True, C_ACCENT), (x + col, y + 4))
+        for i, (name, s) in enumerate(rows.items()):
+            row_y = y + 22 + 16 * i
+            surface.blit(self.font.render(name, True, C_TEXT), (x + 8, row_y))
+            for col, key in ((140, 'p50_ms'), (185, 'p95_ms')):
+                surface.blit(self.font.render(f"{s[key]:.2f}", True, C_TEXT), (x + col, row_y))
@@ -0,0 +1,49 @@
+import math
+
+try:
+    from pygame.math import Vector2
+except ImportError:
+    # Pure-python stand-in so the engine runs on nodes without pygame
+    class Vector2:
+        __slots__ = ('x', 'y')
+
+        def __init__(self, x=0.0, y=0.0):
+            self.x = float(x)
+            self.y = float(y)
+
+        def __add__(self, o): return Vector2(self.x + o[0], self.y + o[1])
+        def __sub__(self, o): return Vector2(self.x - o[0], self.y - o[1])
+        def __mul__(self, k): return Vector2(self.x * k, self.y * k)
+        __rmul__ = __mul__
+        def __neg__(self): return Vector2(-self.x, -self.y)
+        def __eq__(self, o):
+            try: return self.x == o[0] and self.y == o[1]
+            except (TypeError, IndexError): return False
+        def __len__(self): return 2
+        def __iter__(self):
+            yield self.x
+            yield self.y
+        def __getitem__(self, i): return (self.x, self.y)[i]
+        def __repr__(self): return f"Vector2({self.x}, {self.y})"
+
+        def __imul__(self, k):
+            self.x *= k
+            self.y *= k
+            return self
+
+        def length(self): return math.hypot(self.x, self.y)
+        def length_squared(self): return self.x * self.x + self.y * self.y
+        def distance_to(self, o): return math.hypot(self.x - o[0], self.y - o[1])
+
+        def normalize(self):
+            l = self.length()
+            if l == 0: raise ValueError("Can't normalize Vector of length Zero")
+            return Vector2(self.x / l, self.y / l)
+
+        def normalize_ip(self):
+            n = self.normalize()
+            self.x, self.y = n.x, n.y
+
+        def scale_to_length(self, length):
+            n = self.normalize()
+            self.x, self.y = n.x * length, n.y * length
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+import numpy as np
+import config
+from config import CONFIG, WORLD_CACHE_DIR, WORLD_CACHE_MAX
+from contacts import ContactGraph
+from checkpoint import ArrayFile, write_arrays
+
+# Bump when Engine.generate_world draws differently, so stale worlds are not reused
+WORLD_VERSION = 3
+STATIC = ('home', 'age', 'mobility', 'constitution', 'assigned', 'edge_hub')
+
+def world_key(world_seed):
+    blob = json.dumps({'pop_size': int(CONFIG.pop_size), 'k_neighbors': int(CONFIG.k_neighbors), 'graph_model': CONFIG.graph_model,
+                       'rewire_prob': float(CONFIG.rewire_prob), 'seed': world_seed, 'version': WORLD_VERSION,
+                       'ratios': {k: v for k, v in vars(config).items() if k.startswith('PEOPLE_PER_')}}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:24]
+
+def world_path(world_seed, cache_dir=WORLD_CACHE_DIR):
+    return os.path.join(cache_dir, world_key(world_seed) + '.world')
+
+def save_world(engine, path):
+    pop = engine.pop
+    arrays = {name: getattr(pop, name) for name in STATIC}
+    arrays['contacts.indptr'] = engine.contacts.indptr
+    arrays['contacts.indices'] = engine.contacts.indices
+    meta = {'n': len(pop), 'k_neighbors': CONFIG.k_neighbors, 'rewire_prob': CONFIG.rewire_prob, 'graph_model': CONFIG.graph_model}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    write_arrays(path, meta, arrays)
+
+def evict(cache_dir, keep=None, limit=WORLD_CACHE_MAX):
+    # Delete the least recently used worlds past `limit`; engines that already
+    # mapped one keep their pages until they exit
+    files = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.world')]
+    files = [p for p in files if p != keep]
+    files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+    for p in files[max(0, limit - 1):]:
+        try:
+            os.remove(p)
+        except OSError:
+            pass    # another process got there first
+
+def load_or_build(engine, world_seed, cache_dir=WORLD_CACHE_DIR):
+    # Generate once from the world seed, then every engine maps the same file
+    # read-only: replicates share the pages and a stray write raises
+    path = world_path(world_seed, cache_dir)
+    if not os.path.exists(path):
+        engine.generate_world(np.random.default_rng(world_seed))
+        save_world(engine, path)
+        evict(cache_dir, keep=path)
+    else: os.utime(path)    # the modification time doubles as last use
+    f = ArrayFile(path, mode='r')
+    pop = engine.pop
+    if f.meta['n'] != len(pop): raise ValueError(f"{path} holds {f.meta['n']} agents, expected {len(pop)}")
+    for name in STATIC: setattr(pop, name, f.get(name))
+    engine.contacts = ContactGraph(len(pop), f.get('contacts.indptr'), f.get('contacts.indices'))